@@ -5,15 +5,31 @@
 import streamlit as st
 import pandas as pd
 import os
-import networkx as nx
-import plotly.graph_objects as go
+import hashlib
+import tempfile
+
+from safeguarding import audit, load_spec, spec_hash
+from safeguarding.answers import AnswerStore
+from safeguarding.diff import CHANGES, COLUMNS, diff_rules
+from safeguarding.linear_map import iter_text, render_markdown, render_pdf, render_text
+from safeguarding.paths import domain_path_stats
+from safeguarding.referrals import Referral, ReferralStore, ReferralWriteError, default_path
+from safeguarding.reload import SpecWatcher, audit_spec
+from safeguarding.rule_map import build_layout, render_html
+from safeguarding.shared import shared_enabled
+from safeguarding.timing import RunTimings
+from safeguarding.widgets import DATE, FREE_TEXT, NUMERIC, RADIO, SELECT
+
+# Stage timers and counters for this full run (see the debug panel at the
+# bottom); each fragment keeps its own, since fragment reruns skip this line
+timings = RunTimings()
 
 # -----------------------------
 # Excel file path
 # -----------------------------
 
-# Robust path to Excel file
-EXCEL_FILE = os.path.join(
+# Robust path to Excel file (SAFEGUARDING_SPEC overrides, e.g. for benchmarks)
+EXCEL_FILE = os.environ.get("SAFEGUARDING_SPEC") or os.path.join(
     os.path.dirname(os.path.abspath(__file__)),  # folder where this script lives
     "Data",
     "Safeguarding specification v0.1 2025_12_19_PK.xlsx"
@@ -42,206 +58,157 @@ if not os.path.exists(EXCEL_FILE):
     st.error(f"File not found: {EXCEL_FILE}")
     st.stop()
 
-@st.cache_data
-def load_excel(path):
-    df_q = pd.read_excel(path, sheet_name="Safeguarding_Q")
-    df_a = pd.read_excel(path, sheet_name="Safeguarding_A")
-
-    df_q["domain"] = df_q["domain"].str.lower().str.strip()
-    df_a["domain"] = df_a["domain"].str.lower().str.strip()
-
-    # Ensure consistent types
-    df_a["answer_value"] = df_a["answer_value"].astype(str)
-    df_a["next_field_ref"] = df_a["next_field_ref"].astype(str, errors="ignore")
-    df_q["field_ref"] = df_q["field_ref"].astype(str)
-
-    return df_q, df_a
-
-df_q, df_a = load_excel(EXCEL_FILE)
-
-# -----------------------------
-# Precompute rule structures
-# -----------------------------
-domains = df_q["domain"].unique()
-
-child_map = {}
-parent_map = {}
-options_map = {}
-
-for domain in domains:
-    child_map[domain] = {}
-    parent_map[domain] = {}
-
-    domain_q = df_q[df_q["domain"] == domain]
-    domain_a = df_a[df_a["domain"] == domain]
-
-    options_map[domain] = {
-        q["field_ref"]: [
-            o.strip()
-            for o in str(q.get("answer_options", "")).split(";")
-            if o.strip()
-        ]
-        for _, q in domain_q.iterrows()
-    }
-
-    for _, r in domain_a.iterrows():
-        child_map[domain].setdefault(r["field_ref"], []).append(
-            (str(r["answer_value"]), r["next_field_ref"])
-        )
-
-    for _, r in domain_a.iterrows():
-        if pd.notna(r["next_field_ref"]):
-            parent_map[domain].setdefault(r["next_field_ref"], []).append(
-                (r["field_ref"], str(r["answer_value"]))
-            )
+@st.cache_resource
+def load_excel(path, version):
+    # Compiled once per workbook version and shared read-only by all sessions;
+    # the binary snapshot under Data/.snapshots skips openpyxl on cold start
+    return load_spec(path)
+
+@st.cache_resource
+def load_watcher(path):
+    # One per server process: edits to the workbook are compiled and audited
+    # in the background, then swapped in for sessions that start afterwards.
+    # With SAFEGUARDING_SHARED_RULES=1 every worker maps the same packed rules
+    return SpecWatcher(path, shared=shared_enabled())
+
+with timings.timer("load_excel"):
+    watcher = load_watcher(EXCEL_FILE)
+    # A session stays on the version it started with until Reset All
+    spec = st.session_state.setdefault("spec", watcher.current)
+    spec_version = spec.version
+    rules = spec.rules
+    domains = list(rules)
+
+# One writer thread per server process, shared by every session
+@st.cache_resource
+def load_referrals(path):
+    return ReferralStore(path)
+
+referrals = load_referrals(default_path(EXCEL_FILE))
+
+# Seconds a submit waits for its commit before telling the caseworker
+SUBMIT_TIMEOUT = 30
 
 # -----------------------------
 # Session state init
 # -----------------------------
-for domain in domains:
-    for _, q in df_q[df_q["domain"] == domain].iterrows():
-        key = f"{domain}__{q['field_ref']}"
-        st.session_state.setdefault(key, None)
-        st.session_state.setdefault(f"{key}_prev", None)
+# One sparse store per session; entries appear as questions are answered
+with timings.timer("session_init"):
+    answers = st.session_state.setdefault("answers", AnswerStore())
 
 # -----------------------------
 # Reset
 # -----------------------------
 if st.button("Reset All"):
-    for domain in domains:
-        for _, q in df_q[df_q["domain"] == domain].iterrows():
-            key = f"{domain}__{q['field_ref']}"
-            st.session_state[key] = None
-            st.session_state[f"{key}_prev"] = None
+    answers.reset()
+    st.session_state["spec"] = watcher.current
     st.rerun()
 
-# -----------------------------
-# Rule helpers
-# -----------------------------
-def get_next_fields(domain, field_ref, value):
-    return [
-        nxt for ans, nxt in child_map.get(domain, {}).get(field_ref, [])
-        if str(value) == ans
-    ]
+if watcher.current is not spec:
+    st.info("The specification has been updated. Reset All to start again on the new version.")
 
-def clear_children(domain, field_ref):
-    for child in get_next_fields(domain, field_ref, st.session_state.get(f"{domain}__{field_ref}")):
-        child_key = f"{domain}__{child}"
-        if child_key in st.session_state:
-            st.session_state[child_key] = None
-        clear_children(domain, child)
-
-def display_question(domain, q, indent=0):
-    field_ref = q["field_ref"]
-    widget_key = f"{domain}__{field_ref}"
-
-    # Parent gating
-    parents = parent_map.get(domain, {}).get(field_ref, [])
-    if parents:
-        if not any(
-            st.session_state.get(f"{domain}__{parent}") == expected
-            for parent, expected in parents
-        ):
-            return
-
-    options = options_map.get(domain, {}).get(field_ref, [])
-    label = f"{field_ref} – {q['questions_text']}"
-
-    with st.expander(label, expanded=True):
-        if q["answer_type"] == "radio":
-            st.radio("Answer:", options, key=widget_key, label_visibility="collapsed")
-        elif q["answer_type"] == "select":
-            st.selectbox("Answer:", options, key=widget_key, label_visibility="collapsed")
-        elif q["answer_type"] == "free_text":
-            st.text_input("Answer:", key=widget_key, label_visibility="collapsed")
-        elif q["answer_type"] == "numeric":
-            st.number_input("Answer:", key=widget_key, label_visibility="collapsed")
-        elif q["answer_type"] == "date":
-            st.date_input("Answer:", key=widget_key, label_visibility="collapsed")
-
-    prev_key = f"{widget_key}_prev"
-    current_val = st.session_state.get(widget_key)
-
-    if st.session_state[prev_key] != current_val:
-        clear_children(domain, field_ref)
-        st.session_state[prev_key] = current_val
-
-    for child in get_next_fields(domain, field_ref, current_val):
-        child_rows = df_q[(df_q["domain"] == domain) & (df_q["field_ref"] == child)]
-        if child_rows.empty:
-            st.warning(f"Rule points to missing question: {child} (domain: {domain})")
-            continue
-        display_question(domain, child_rows.iloc[0], indent + 1)
+if referrals.errors:
+    when, rows, message = referrals.errors[-1]
+    st.warning(
+        f"{len(referrals.errors)} referral write failure(s) on this server, "
+        f"latest at {when}: {message}"
+    )
 
 # -----------------------------
-# Build audit rules map
+# Rule helpers
 # -----------------------------
-def build_linear_rule_map(domain, max_depth=6):
-    da = df_a[df_a["domain"] == domain]
-    dq = df_q[df_q["domain"] == domain]
-
-    children = {}
-    for _, r in da.iterrows():
-        children.setdefault(r["field_ref"], []).append(
-            (str(r["answer_value"]), r["next_field_ref"])
-        )
-
-    seen = set()
-    lines = []
-
-    def walk(node, depth):
-        if depth > max_depth:
-            lines.append("  " * depth + "… (depth limit)")
-            return
-
-        if node in seen:
-            lines.append("  " * depth + f"↪ {node} (already shown)")
-            return
-
-        seen.add(node)
-
-        q_text = dq.loc[dq["field_ref"] == node, "questions_text"]
-        label = q_text.iloc[0] if not q_text.empty else ""
-
-        lines.append("  " * depth + f"■ {node}: {label}")
-
-        for answer, nxt in children.get(node, []):
-            if pd.isna(nxt) or nxt == "nan":
-                lines.append("  " * (depth + 1) + f"─ [{answer}] → END")
-            else:
-                lines.append("  " * (depth + 1) + f"─ [{answer}] →")
-                walk(nxt, depth + 2)
-
-    for root in find_top_level(domain):
-        lines.append(f"=== {root} ===")
-        walk(root, 1)
-        lines.append("")
-
-    return "\n".join(lines)
+def form_timings(domain):
+    # Callbacks run just before their fragment reruns; what they count is
+    # picked up by that rerun's timings
+    return st.session_state.setdefault(f"timings_{domain}", RunTimings(f"form.{domain}"))
+
+def clear_children(domain, cleared, timings):
+    # Drop widget state so cleared questions come back blank
+    store = st.session_state["answers"]
+    dr = rules[domain]
+    for child in cleared:
+        st.session_state.pop(store.widget_key(domain, dr.refs[child]), None)
+    timings.count("children_cleared", len(cleared))
+
+def on_answer(domain, node, widget_key):
+    # Runs before the rerun, so only the changed subtree is re-evaluated
+    timings = form_timings(domain)
+    dr = rules[domain]
+    form = st.session_state["answers"].form(domain, dr)
+    before = form.evaluated
+    value = dr.questions[node].widget.coerce(st.session_state.get(widget_key))
+    clear_children(domain, form.answer(node, value), timings)
+    timings.count("visibility_evaluated", form.evaluated - before)
+
+# One entry per widget kind; descriptors carry everything else
+WIDGETS = {
+    RADIO: lambda w, **kw: st.radio("Answer:", w.options, index=w.default, **kw),
+    SELECT: lambda w, **kw: st.selectbox("Answer:", w.options, index=w.default, **kw),
+    FREE_TEXT: lambda w, **kw: st.text_input("Answer:", value=w.default, **kw),
+    NUMERIC: lambda w, **kw: st.number_input("Answer:", value=w.default, **kw),
+    DATE: lambda w, **kw: st.date_input("Answer:", value=w.default, **kw),
+}
 
+def display_question(domain, q, timings, indent=0, value=None):
+    widget_key = answers.widget_key(domain, q.field_ref)
+    # Widgets left off the page lose their state; bring the answer back
+    if value is not None and widget_key not in st.session_state:
+        st.session_state[widget_key] = value
+
+    timings.count("questions_rendered")
+    widget = q.widget
+    with st.expander(widget.label, expanded=True):
+        render = WIDGETS.get(widget.kind)
+        if render is not None:
+            render(
+                widget,
+                key=widget_key,
+                label_visibility="collapsed",
+                on_change=on_answer,
+                args=(domain, q.node, widget_key),
+            )
 
+def show_timings(timings, title="Debug: timings for this run"):
+    with st.expander(title):
+        stage_rows, counter_rows = timings.rows()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.dataframe(pd.DataFrame(stage_rows, columns=["stage", "ms"]), hide_index=True)
+        with col2:
+            st.dataframe(pd.DataFrame(counter_rows, columns=["counter", "count"]), hide_index=True)
 
 # -----------------------------
 # Audit helpers
 # -----------------------------
-def find_top_level(domain):
-    q = set(df_q[df_q["domain"] == domain]["field_ref"])
-    children = set(df_a[df_a["domain"] == domain]["next_field_ref"].dropna())
-    return sorted(q - children)
-
-def find_missing_targets(domain):
-    q = set(df_q[df_q["domain"] == domain]["field_ref"])
-    targets = set(df_a[df_a["domain"] == domain]["next_field_ref"].dropna())
-    return sorted(targets - q)
-
-def find_ambiguous_rules(domain):
-    issues = []
-    da = df_a[df_a["domain"] == domain]
-    grouped = da.groupby(["field_ref", "answer_value"])
-    for (field, answer), g in grouped:
-        if g["next_field_ref"].nunique() > 1:
-            issues.append((field, answer))
-    return issues
+@st.cache_resource
+def load_audit(version, _spec):
+    # Only computed when the audit tab is opened, then shared per version
+    return audit_spec(_spec)
+
+@st.cache_resource
+def load_path_stats(version, _rules):
+    return domain_path_stats(_rules)
+
+@st.cache_resource
+def load_diff(old_version, new_version, _old_rules, _new_rules):
+    return diff_rules(_old_rules, _new_rules)
+
+def other_workbooks():
+    folder = os.path.dirname(os.path.abspath(EXCEL_FILE))
+    current = os.path.basename(EXCEL_FILE)
+    return sorted(
+        f for f in os.listdir(folder)
+        if f.endswith(".xlsx") and f != current and not f.startswith("~$")
+    )
+
+def uploaded_workbook(upload):
+    # Saved under its content hash so repeat uploads hit the caches
+    data = upload.getvalue()
+    path = os.path.join(tempfile.gettempdir(), f"spec-{hashlib.sha256(data).hexdigest()[:16]}.xlsx")
+    if not os.path.exists(path):
+        with open(path, "wb") as fh:
+            fh.write(data)
+    return path
 
 # -----------------------------
 # Tabs
@@ -254,73 +221,332 @@ DOMAIN_LABELS = {
 
 active_domains = [d for d in DOMAIN_LABELS if d in domains]
 
-tabs = st.tabs([DOMAIN_LABELS[d] for d in active_domains] + ["Rule Audit"])
+# Tracking the selected tab lets the map and audit run only while open
+tabs = st.tabs(
+    [DOMAIN_LABELS[d] for d in active_domains] + ["Rule Map", "Rule Audit"],
+    key="active_tab",
+    on_change="rerun",
+)
+map_tab, audit_tab = tabs[len(active_domains):]
 
 # -----------------------------
 # Question tabs
 # -----------------------------
+# Large forms open step by step so each rerun sends a bounded number of
+# widgets however far the referral has gone
+VIEW_MODES = ("All questions", "Step by step", "Next questions only")
+STEP_SIZE = 15
+LARGE_FORM = 40
+
+def step_key(domain):
+    return f"step_{domain}__{answers.generation}"
+
+def move_step(domain, delta):
+    st.session_state[step_key(domain)] = st.session_state.get(step_key(domain), 0) + delta
+
+def render_entries(domain, dr, form, positions, timings):
+    for i in positions:
+        node = form.order[i]
+        if node >= dr.n_questions:
+            st.warning(f"Rule points to missing question: {dr.refs[node]} (domain: {domain})")
+            continue
+        display_question(domain, dr.questions[node], timings, form.depth[i], form.get(node))
+
+def answered_summary(dr, form, shown):
+    # One dataframe instead of a widget per question; the grid only draws
+    # the rows in view
+    rows = [
+        (dr.refs[node], dr.questions[node].text, str(form.values[node]))
+        for i, node in enumerate(form.order)
+        if i not in shown and form.values.get(node) is not None
+    ]
+    if rows:
+        with st.expander(f"Other answers ({len(rows)})"):
+            st.dataframe(
+                pd.DataFrame(rows, columns=["field_ref", "question", "answer"]),
+                hide_index=True,
+            )
+
+def step_view(domain, dr, form, timings):
+    steps = form.steps(STEP_SIZE)
+    if not steps:
+        # No top-level questions, e.g. every root sits inside a rule loop
+        st.info("This domain has no questions to show.")
+        return set()
+    step = min(max(st.session_state.get(step_key(domain), 0), 0), len(steps) - 1)
+    st.session_state[step_key(domain)] = step
+    start, end = steps[step]
+
+    first = form.order[start]
+    if first < dr.n_questions and dr.questions[first].section:
+        st.subheader(dr.questions[first].section)
+    st.caption(f"Step {step + 1} of {len(steps)} (so far)")
+    render_entries(domain, dr, form, range(start, end), timings)
+
+    col1, col2, _ = st.columns([1, 1, 6])
+    col1.button("◀ Previous", key=f"prev_{domain}", disabled=step == 0,
+                on_click=move_step, args=(domain, -1))
+    col2.button("Next ▶", key=f"next_{domain}", disabled=step == len(steps) - 1,
+                on_click=move_step, args=(domain, 1))
+    return set(range(start, end))
+
+def frontier_view(domain, dr, form, timings):
+    positions = form.frontier(STEP_SIZE)
+    missing = [dr.refs[n] for n in form.order if n >= dr.n_questions]
+    if missing:
+        st.warning(f"Rules point to missing questions: {', '.join(missing)} (domain: {domain})")
+    if not form.order:
+        st.info("This domain has no questions to show.")
+    elif not positions:
+        st.info("Every visible question has been answered.")
+    render_entries(domain, dr, form, positions, timings)
+    return set(positions)
+
+# Each form is a fragment: a widget change reruns only its own tab
+@st.fragment
+def domain_form(domain):
+    timings = st.session_state.pop(f"timings_{domain}", None) or RunTimings(f"form.{domain}")
+    st.header(DOMAIN_LABELS[domain])
+    dr = rules[domain]
+    form = answers.form(domain, dr)
+    mode = st.radio(
+        "View",
+        VIEW_MODES,
+        index=1 if len(form.order) > LARGE_FORM else 0,
+        key=f"view_{domain}",
+        horizontal=True,
+    )
+    with timings.timer(f"form.{domain}"):
+        if mode == VIEW_MODES[0]:
+            render_entries(domain, dr, form, range(len(form.order)), timings)
+        else:
+            view = step_view if mode == VIEW_MODES[1] else frontier_view
+            answered_summary(dr, form, view(domain, dr, form, timings))
+
+    path = form.path()
+    unsaved_key = f"unsaved_{domain}__{answers.generation}"
+    if st.button("Submit referral", key=f"submit_{domain}", disabled=not path):
+        # Trying again with the same answers reuses the referral, so a write
+        # that did land after all is not stored twice
+        referral = st.session_state.get(unsaved_key)
+        if referral is None or referral.path != path:
+            referral = Referral(domain, spec_version, path, started_at=form.started)
+        with timings.timer("submit"):
+            try:
+                referrals.submit(referral).result(timeout=SUBMIT_TIMEOUT)
+            except (ReferralWriteError, TimeoutError) as exc:
+                st.session_state[unsaved_key] = referral
+                if isinstance(exc, TimeoutError):
+                    reason = "the database did not respond in time"
+                else:
+                    reason = str(exc) or "the write failed"
+                st.error(
+                    f"Referral NOT saved: {reason}. "
+                    "Your answers are still here – press Submit referral to try again."
+                )
+            else:
+                st.session_state.pop(unsaved_key, None)
+                st.success(f"Referral submitted ({len(path)} answers) – reference {referral.id[:8]}")
+    show_timings(timings)
+    timings.flush()
+
 for tab, domain in zip(tabs[:len(active_domains)], active_domains):
     with tab:
-        st.header(DOMAIN_LABELS[domain])
-        domain_q = df_q[df_q["domain"] == domain]
-        domain_a = df_a[df_a["domain"] == domain]
-
-        top = domain_q[~domain_q["field_ref"].isin(domain_a["next_field_ref"].dropna())]
-        for _, q in top.iterrows():
-            display_question(domain, q)
+        domain_form(domain)
 
 # -----------------------------
-# Rule Trees tab (Linear Map)
+# Rule Map tab
 # -----------------------------
-# with tabs[len(active_domains)]:
-#     st.header("Rule Maps (Linear)")
-
-#     st.caption(
-#         "Top-down, deterministic rule flow. "
-#         "Designed for readability and A4-style viewing."
-#     )
-
-#     for domain in active_domains:
-#         st.subheader(DOMAIN_LABELS[domain])
-
-#         rule_map = build_linear_rule_map(domain)
-
-#         st.text_area(
-#             label="",
-#             value=rule_map,
-#             height=700
-#         )
-# st.caption("Indented linear rule flow. Nodes shown once; repeated paths are referenced.")
+@st.cache_resource
+def load_rule_map(version, domain, _rules):
+    # Positions are computed once per spec version; the browser only draws
+    return render_html(build_layout(_rules[domain]))
+
+@st.cache_resource
+def load_linear_map(version, domain, _rules):
+    return render_text(_rules[domain])
+
+@st.cache_resource
+def load_linear_export(version, domain, fmt, _rules):
+    # Built on first download only, then kept per spec version
+    title = f"{DOMAIN_LABELS[domain]} – linear rule map ({version[:12]})"
+    if fmt == "md":
+        return render_markdown(_rules[domain], title)
+    return render_pdf(iter_text(_rules[domain]), title)
+
+@st.fragment
+def rule_map():
+    timings = RunTimings("rule_map")
+    st.header("Rule Map")
+    col1, col2 = st.columns([3, 1])
+    domain = col1.selectbox(
+        "Domain", active_domains, format_func=DOMAIN_LABELS.get, key="rule_map_domain"
+    )
+    view = col2.radio("View", ["Graph", "Linear"], horizontal=True, key="rule_map_view")
+
+    if view == "Graph":
+        with timings.timer("rule_map"):
+            html = load_rule_map(spec_version, domain, rules)
+        st.iframe(html, height=720)
+        st.caption(
+            "Hover a question for its text. Green boxes are collapsed branches: "
+            "double-click to expand. Drag to pan, scroll to zoom."
+        )
+    else:
+        with timings.timer("linear_map"):
+            text = load_linear_map(spec_version, domain, rules)
+        st.code(text, language=None, height=700)
+        st.caption("Indented linear rule flow. Nodes shown once; repeated paths are referenced.")
 
+        name = f"rule-map-{domain}"
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("Download text", text, f"{name}.txt", "text/plain")
+        col2.download_button(
+            "Download Markdown",
+            lambda: load_linear_export(spec_version, domain, "md", rules),
+            f"{name}.md",
+            "text/markdown",
+        )
+        col3.download_button(
+            "Download PDF (A4)",
+            lambda: load_linear_export(spec_version, domain, "pdf", rules),
+            f"{name}.pdf",
+            "application/pdf",
+        )
+    show_timings(timings)
+    timings.flush()
 
+with map_tab:
+    if map_tab.open:
+        rule_map()
 
 # -----------------------------
 # Rule Audit tab
 # -----------------------------
-with tabs[len(active_domains) ]:
+@st.fragment
+def rule_audit():
+    timings = RunTimings("rule_audit")
     st.header("Rule Audit")
-    for domain in active_domains:
-        st.subheader(DOMAIN_LABELS[domain])
-        col1, col2, col3 = st.columns(3)
-
+    if watcher.rejected:
+        version, reason = watcher.rejected
+        st.warning(f"Workbook change {version[:12]} was not loaded: {reason}")
+    with timings.timer("audit"):
+        report = load_audit(spec_version, spec)
+        stats = load_path_stats(spec_version, rules)
+        for domain in active_domains:
+            result = report[domain]
+            st.subheader(DOMAIN_LABELS[domain])
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                st.markdown("**Top-level questions**")
+                st.write(list(result.top_level))
+
+            with col2:
+                st.markdown("**Missing rule targets**")
+                missing = list(result.missing_targets)
+                st.write(missing if missing else "None ✅")
+
+            with col3:
+                st.markdown("**Ambiguous rules**")
+                amb = list(result.ambiguous_rules)
+                st.write(amb if amb else "None ✅")
+
+            checks = audit.CHECKS[3:]
+            for col, (attr, label, severity) in zip(st.columns(len(checks)), checks):
+                with col:
+                    st.markdown(f"**{label}**")
+                    found = list(getattr(result, attr))
+                    st.write(found if found else "None ✅")
+
+            show_path_stats(stats[domain])
+
+            with st.expander("Raw rules (questions)"):
+                st.dataframe(spec.df_q[spec.df_q["domain"] == domain])
+
+            with st.expander("Raw rules (answers)"):
+                st.dataframe(spec.df_a[spec.df_a["domain"] == domain])
+
+            st.divider()
+
+    compare_versions(timings)
+    show_timings(timings)
+    timings.flush()
+
+def show_path_stats(result):
+    st.markdown("**Referral paths**")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Distinct paths", f"{result.paths:,}")
+    col2.metric("Longest (questions)", result.longest)
+    col3.metric("Shortest (questions)", result.shortest)
+    col4.metric("Average (questions)", f"{result.mean_length:.1f}")
+    if result.loops:
+        st.caption("Some rules loop back to an earlier question; those paths end at the loop.")
+
+    with st.expander("Path lengths, question depths and coverage"):
+        col1, col2 = st.columns(2)
         with col1:
-            st.markdown("**Top-level questions**")
-            st.write(find_top_level(domain))
-
+            st.markdown("Paths by length (questions answered)")
+            st.bar_chart(pd.Series(result.lengths, name="paths").rename_axis("questions"))
         with col2:
-            st.markdown("**Missing rule targets**")
-            missing = find_missing_targets(domain)
-            st.write(missing if missing else "None ✅")
-
-        with col3:
-            st.markdown("**Ambiguous rules**")
-            amb = find_ambiguous_rules(domain)
-            st.write(amb if amb else "None ✅")
+            st.markdown("Questions by depth from the top")
+            st.bar_chart(pd.Series(result.depths, name="questions").rename_axis("depth"))
+        st.markdown("Share of paths that ask each question")
+        coverage = pd.DataFrame(result.coverage, columns=["field_ref", "paths", "share"])
+        coverage["paths"] = coverage["paths"].astype(str)
+        st.dataframe(
+            coverage,
+            hide_index=True,
+            column_config={"share": st.column_config.ProgressColumn("share", format="percent")},
+        )
 
-        with st.expander("Raw rules (questions)"):
-            st.dataframe(df_q[df_q["domain"] == domain])
+def compare_versions(timings):
+    st.subheader("Compare with another version")
+    folder = os.path.dirname(os.path.abspath(EXCEL_FILE))
+    choice = st.selectbox(
+        "Earlier workbook", other_workbooks(), index=None, placeholder="Choose a workbook in Data/"
+    )
+    upload = st.file_uploader("…or upload one", type="xlsx")
+    if upload is not None:
+        old_path = uploaded_workbook(upload)
+    elif choice is not None:
+        old_path = os.path.join(folder, choice)
+    else:
+        return
+
+    with timings.timer("diff"):
+        old_version = spec_hash(old_path)
+        old_spec = load_excel(old_path, old_version)
+        diff = load_diff(old_version, spec_version, old_spec.rules, rules)
+
+    if not diff:
+        st.success("No rule changes between the two versions.")
+        return
+    for result in diff:
+        st.markdown(f"**{DOMAIN_LABELS.get(result.domain, result.domain)}** – {result.total} change(s)")
+        if not result:
+            continue
+        for col, (attr, label) in zip(st.columns(len(CHANGES)), CHANGES):
+            col.metric(label, len(getattr(result, attr)))
+        for attr, label in CHANGES:
+            items = getattr(result, attr)
+            if items:
+                with st.expander(f"{label} ({len(items)})"):
+                    rows = [i if isinstance(i, tuple) else (i,) for i in items]
+                    st.dataframe(pd.DataFrame(rows, columns=COLUMNS[attr]), hide_index=True)
+
+with audit_tab:
+    if audit_tab.open:
+        rule_audit()
 
-        with st.expander("Raw rules (answers)"):
-            st.dataframe(df_a[df_a["domain"] == domain])
+# -----------------------------
+# Debug: full-run timings
+# -----------------------------
+# Forms, the map and the audit show their own timings inside each tab
+show_timings(timings, "Debug: timings for the last full run")
+st.caption(
+    "Set SAFEGUARDING_METRICS_FILE (Prometheus text) or SAFEGUARDING_TRACE_FILE "
+    "(JSON spans) to export timings to a local file."
+)
 
-        st.divider()
+timings.flush()
@@ -0,0 +1,95 @@
+# ===============================================
+# Benchmark: building the rule structures
+# ===============================================
+#
+#   python benchmarks/bench_compile.py [--rows 100000]
+#
+# Compares the original per-domain iterrows() precompute (kept here
+# verbatim as the baseline) with safeguarding.rules.compile_rules on a
+# synthetic answer sheet from safeguarding.synthetic.
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safeguarding.rules import compile_rules  # noqa: E402
+from safeguarding.spec import normalise_sheets  # noqa: E402
+from safeguarding.synthetic import DEFAULT_DOMAINS, generate_sheets  # noqa: E402
+
+
+def synthetic_sheets(rows):
+    # ~2.65 rule rows per question with the default answer-type mix
+    questions = max(1, int(rows / 2.65 / len(DEFAULT_DOMAINS)))
+    df_q, df_a = generate_sheets(questions=questions, branching=4, depth=12, roots=20)
+    return normalise_sheets(df_q, df_a)
+
+
+def baseline_maps(df_q, df_a):
+    domains = df_q["domain"].unique()
+
+    child_map = {}
+    parent_map = {}
+    options_map = {}
+
+    for domain in domains:
+        child_map[domain] = {}
+        parent_map[domain] = {}
+
+        domain_q = df_q[df_q["domain"] == domain]
+        domain_a = df_a[df_a["domain"] == domain]
+
+        options_map[domain] = {
+            q["field_ref"]: [
+                o.strip()
+                for o in str(q.get("answer_options", "")).split(";")
+                if o.strip()
+            ]
+            for _, q in domain_q.iterrows()
+        }
+
+        for _, r in domain_a.iterrows():
+            child_map[domain].setdefault(r["field_ref"], []).append(
+                (str(r["answer_value"]), r["next_field_ref"])
+            )
+
+        for _, r in domain_a.iterrows():
+            if pd.notna(r["next_field_ref"]):
+                parent_map[domain].setdefault(r["next_field_ref"], []).append(
+                    (r["field_ref"], str(r["answer_value"]))
+                )
+
+    return child_map, parent_map, options_map
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time building the rule structures.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df_q, df_a = synthetic_sheets(args.rows)
+    print(f"{len(df_q)} questions, {len(df_a)} answer rows")
+
+    baseline = best_of(lambda: baseline_maps(df_q, df_a), 1)
+    compiled = best_of(lambda: compile_rules(df_q, df_a), args.repeat)
+    print(f"baseline iterrows : {baseline * 1000:9.1f} ms")
+    print(f"compile_rules     : {compiled * 1000:9.1f} ms")
+    print(f"speedup           : {baseline / compiled:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# ===============================================
+# Benchmark: bulk referral replay
+# ===============================================
+#
+#   python benchmarks/bench_replay.py --referrals 50000 --workers 4
+#
+# Builds a synthetic workbook and a second version with some rule targets
+# rewired, generates referrals by answering the first version's forms at
+# random and writes them out as JSON lines, then times reading them back
+# and a diff replay in one process and across a pool.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safeguarding.replay import read_referrals, run_replay, write_jsonl  # noqa: E402
+from safeguarding.spec import load_spec  # noqa: E402
+from safeguarding.synthetic import generate_referrals, generate_sheets, write_workbook  # noqa: E402
+
+
+def rewire(df_a, fraction, seed):
+    """A copy of ``df_a`` with ``fraction`` of the rule targets shuffled.
+
+    Targets only move within a domain, so every question keeps a parent
+    and no new top-level questions appear.
+    """
+    rng = random.Random(seed)
+    df_a = df_a.copy()
+    for _, group in df_a[df_a["next_field_ref"].notna()].groupby("domain"):
+        rows = rng.sample(list(group.index), int(len(group) * fraction))
+        targets = df_a.loc[rows, "next_field_ref"].tolist()
+        rng.shuffle(targets)
+        df_a.loc[rows, "next_field_ref"] = targets
+    return df_a
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time replaying referrals across spec versions.")
+    parser.add_argument("--questions", type=int, default=500, help="questions per domain")
+    parser.add_argument("--referrals", type=int, default=20000)
+    parser.add_argument("--rewire", type=float, default=0.05, help="fraction of rules changed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.xlsx")
+        new_path = os.path.join(tmp, "new.xlsx")
+        df_q, df_a = generate_sheets(questions=args.questions)
+        write_workbook(old_path, df_q, df_a)
+        write_workbook(new_path, df_q, rewire(df_a, args.rewire, seed=1))
+
+        start = time.perf_counter()
+        records = generate_referrals(load_spec(old_path).rules, args.referrals)
+        load_spec(new_path)
+        answers = sum(len(r[2]) for r in records)
+        print(f"generated {len(records)} referrals ({answers / len(records):.1f} answers each) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        # Replay from a file, as the command line does, so dates and numbers
+        # arrive as JSON text
+        jsonl_path = os.path.join(tmp, "referrals.jsonl")
+        write_jsonl(jsonl_path, records)
+        start = time.perf_counter()
+        records = read_referrals(jsonl_path)
+        print(f"read {len(records)} referrals from JSON lines in {time.perf_counter() - start:.2f}s")
+
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            changes = run_replay(records, (old_path, new_path), workers)
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:<3} {elapsed:7.2f}s  {len(records) / elapsed:10,.0f} referrals/s  "
+                  f"{len(changes)} changed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# ===============================================
+# Benchmark: per-worker memory, pickled vs shared rules
+# ===============================================
+#
+#   python benchmarks/bench_shared.py --questions 5000 --workers 4
+#
+# Generates a synthetic workbook, builds both the pickle snapshot and the
+# packed rules file, then starts ``--workers`` processes per mode.  Each
+# one starts a SpecWatcher as the app and the API do (load plus audit),
+# answers ``--sessions`` random forms (as a worker serving that many
+# referrals would) and reports its start-up time and
+# private memory (Linux: Private_Clean + Private_Dirty from
+# /proc/self/smaps_rollup).  Shared pages of the mapped rules file are
+# counted once by the kernel however many workers attach.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safeguarding.shared import load_shared_spec  # noqa: E402
+from safeguarding.spec import load_spec  # noqa: E402
+from safeguarding.synthetic import generate_sheets, write_workbook  # noqa: E402
+
+WORKER = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from safeguarding.reload import SpecWatcher
+from safeguarding.synthetic import generate_referrals
+
+def private_kb():
+    total = 0
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+before = private_kb()
+start = time.perf_counter()
+watcher = SpecWatcher({workbook!r}, snapshot_dir={snapshots!r}, start=False, shared={shared!r})
+spec = watcher.current
+load_ms = (time.perf_counter() - start) * 1000
+generate_referrals(spec.rules, {sessions!r}, seed={seed!r})
+print(json.dumps({{"load_ms": load_ms, "private_kb": private_kb() - before}}))
+"""
+
+
+def run_workers(workbook, snapshots, shared, workers, sessions):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER.format(
+                root=ROOT, shared=shared, workbook=workbook,
+                snapshots=snapshots, sessions=sessions, seed=i,
+            )],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for i in range(workers)
+    ]
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode:
+            raise RuntimeError("worker failed")
+        results.append(json.loads(out))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-worker memory of pickled and shared rules.")
+    parser.add_argument("--questions", type=int, default=5000, help="questions per domain")
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=50, help="forms answered per worker")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("needs Linux /proc/self/smaps_rollup", file=sys.stderr)
+        return 1
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = os.path.join(tmp, "synthetic.xlsx")
+        snapshots = os.path.join(tmp, "snapshots")
+        df_q, df_a = generate_sheets(
+            questions=args.questions, branching=args.branching, depth=args.depth
+        )
+        write_workbook(workbook, df_q, df_a)
+        load_spec(workbook, snapshots)
+        load_shared_spec(workbook, snapshots)
+        results["questions"] = len(df_q)
+        results["rules"] = len(df_a)
+
+        for mode, shared in (("pickle", False), ("shared", True)):
+            runs = run_workers(workbook, snapshots, shared, args.workers, args.sessions)
+            results[f"{mode}_load_ms"] = statistics.median(r["load_ms"] for r in runs)
+            results[f"{mode}_private_mb"] = statistics.median(r["private_kb"] for r in runs) / 1024
+        results["rules_file_mb"] = sum(
+            os.path.getsize(os.path.join(snapshots, name))
+            for name in os.listdir(snapshots) if name.endswith(".rules.bin")
+        ) / 2**20
+
+    for name, value in results.items():
+        shown = f"{value:10.1f}" if isinstance(value, float) else f"{value!s:>10}"
+        print(f"{name:<20}{shown}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# ===============================================
+# Benchmark: every stage of the app, headless
+# ===============================================
+#
+#   python benchmarks/bench_stages.py --questions 2000 --json results.json
+#   python benchmarks/bench_stages.py --max-click-ms 500   # CI gate
+#
+# Generates a synthetic workbook, then times parsing, compilation,
+# snapshot round trips and the audit directly, and the Streamlit script
+# itself through AppTest (first run and per-click reruns).  Exits 1 when
+# a --max-*-ms budget is exceeded.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safeguarding.audit import run_audit  # noqa: E402
+from safeguarding.rules import compile_rules  # noqa: E402
+from safeguarding.spec import load_spec, read_spec  # noqa: E402
+from safeguarding.synthetic import generate_sheets, write_workbook  # noqa: E402
+
+APP = os.path.join(ROOT, "Concept_v06.py")
+
+
+def timed(fn, repeat=1):
+    """Best wall time of ``repeat`` calls, in ms, and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_app(workbook, clicks):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["SAFEGUARDING_SPEC"] = workbook
+    at = AppTest.from_file(APP, default_timeout=600)
+    first, _ = timed(at.run)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    # The first question with a choice, not the view switch
+    radios = [w for w in at.radio if len(w.options) > 1 and not w.key.startswith("view_")]
+    if not radios:
+        return first, None
+
+    key = radios[0].key
+    samples = []
+    for i in range(clicks):
+        widget = at.radio(key=key)
+        samples.append(timed(widget.set_value(widget.options[(i + 1) % 2]).run)[0])
+    return first, statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the safeguarding app.")
+    parser.add_argument("--questions", type=int, default=500, help="questions per domain")
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--clicks", type=int, default=5)
+    parser.add_argument("--no-app", action="store_true", help="skip the AppTest stages")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--max-click-ms", type=float)
+    parser.add_argument("--max-compile-ms", type=float)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = os.path.join(tmp, "synthetic.xlsx")
+        df_q, df_a = generate_sheets(
+            questions=args.questions, branching=args.branching, depth=args.depth
+        )
+        write_workbook(workbook, df_q, df_a)
+        results["questions"] = len(df_q)
+        results["rules"] = len(df_a)
+
+        results["parse_ms"], (df_q, df_a) = timed(lambda: read_spec(workbook), args.repeat)
+        results["compile_ms"], rules = timed(lambda: compile_rules(df_q, df_a), args.repeat)
+        results["audit_ms"], _ = timed(lambda: run_audit(rules), args.repeat)
+
+        snapshots = os.path.join(tmp, "snapshots")
+        results["snapshot_build_ms"], _ = timed(lambda: load_spec(workbook, snapshots))
+        results["snapshot_load_ms"], _ = timed(lambda: load_spec(workbook, snapshots), args.repeat)
+
+        if not args.no_app:
+            results["app_first_run_ms"], results["app_click_ms"] = bench_app(workbook, args.clicks)
+
+    for name, value in results.items():
+        shown = f"{value:10.1f}" if isinstance(value, float) else f"{value!s:>10}"
+        print(f"{name:<20}{shown}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    failed = []
+    if args.max_click_ms is not None and (results.get("app_click_ms") or 0) > args.max_click_ms:
+        failed.append("app_click_ms")
+    if args.max_compile_ms is not None and results["compile_ms"] > args.max_compile_ms:
+        failed.append("compile_ms")
+    for name in failed:
+        print(f"budget exceeded: {name}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
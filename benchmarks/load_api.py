@@ -0,0 +1,193 @@
+# ===============================================
+# Load test: the JSON evaluation API
+# ===============================================
+#
+#   python benchmarks/load_api.py --workers 4 --connections 64 --seconds 10
+#   python benchmarks/load_api.py --url http://127.0.0.1:8600 --connections 64
+#   python benchmarks/load_api.py --local --requests 5000
+#
+# Generates random referrals for the workbook's domains (answered in the
+# order the app shows them) and posts them to /domains/{domain}/evaluate.
+# By default it starts `python -m safeguarding.api` with --workers
+# processes and drives it over keep-alive HTTP/1.1 connections (stdlib
+# asyncio, no client library); --url targets a server that is already
+# running and --local calls the app in-process through LocalClient.
+# Reports requests per second and latency percentiles.  Exits 1 when a
+# response is not 200 or a --min-rps budget is missed.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safeguarding.api import LocalClient, create_app  # noqa: E402
+from safeguarding.spec import load_spec  # noqa: E402
+from safeguarding.synthetic import generate_referrals  # noqa: E402
+
+DEFAULT_SPEC = os.path.join(ROOT, "Data", "Safeguarding specification v0.1 2025_12_19_PK.xlsx")
+
+
+def make_requests(workbook, count, seed):
+    """``(path, body bytes)`` per synthetic referral."""
+    rules = load_spec(workbook).rules
+    requests = []
+    for id, domain, path in generate_referrals(rules, count, seed=seed):
+        body = {"id": id, "answers": [[ref, str(value)] for ref, value in path]}
+        requests.append((f"/domains/{domain}/evaluate", json.dumps(body).encode("utf-8")))
+    return requests
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000  # noqa: E731
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99)}
+
+
+# -----------------------------
+# Over HTTP
+# -----------------------------
+async def connection(host, port, requests, offset, deadline, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            path, body = requests[i % len(requests)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(status)
+    finally:
+        writer.close()
+
+
+async def drive(url, requests, connections, seconds):
+    parts = urlsplit(url)
+    latencies, failures = [], []
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        connection(parts.hostname, parts.port or 80, requests, i * 97, deadline, latencies, failures)
+        for i in range(connections)
+    ))
+    return time.perf_counter() - start, latencies, failures
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=2) as response:
+                return json.load(response)
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+# -----------------------------
+# In process
+# -----------------------------
+def run_local(workbook, requests, count):
+    client = LocalClient(create_app(workbook))
+    latencies, failures = [], []
+    start = time.perf_counter()
+    for i in range(count):
+        path, body = requests[i % len(requests)]
+        t = time.perf_counter()
+        status, _ = client.post(path, json.loads(body))
+        latencies.append(time.perf_counter() - t)
+        if status != 200:
+            failures.append(status)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed, latencies, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the JSON evaluation API.")
+    parser.add_argument("--workbook", default=os.environ.get("SAFEGUARDING_SPEC") or DEFAULT_SPEC)
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--local", action="store_true", help="call the app in-process")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8611)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--requests", type=int, default=5000, help="requests for --local")
+    parser.add_argument("--referrals", type=int, default=2000, help="distinct request bodies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--min-rps", type=float)
+    args = parser.parse_args(argv)
+
+    requests = make_requests(args.workbook, args.referrals, args.seed)
+    server = None
+    if args.local:
+        elapsed, latencies, failures = run_local(args.workbook, requests, args.requests)
+    else:
+        url = args.url
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            server = subprocess.Popen([
+                sys.executable, "-m", "safeguarding.api", args.workbook,
+                "--port", str(args.port), "--workers", str(args.workers),
+            ], cwd=ROOT)
+        try:
+            wait_until_up(url)
+            elapsed, latencies, failures = asyncio.run(
+                drive(url, requests, args.connections, args.seconds)
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    results = {
+        "mode": "local" if args.local else "http",
+        "workers": None if args.local or args.url else args.workers,
+        "requests": len(latencies),
+        "failures": len(failures),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+    if latencies:
+        results.update(percentiles(latencies))
+
+    for name, value in results.items():
+        shown = f"{value:10.1f}" if isinstance(value, float) else f"{value!s:>10}"
+        print(f"{name:<20}{shown}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    failed = failures or (args.min_rps is not None and results["rps"] < args.min_rps)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
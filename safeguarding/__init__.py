@@ -0,0 +1,27 @@
+# ===============================================
+# Safeguarding rules engine
+# ===============================================
+#
+# Streamlit-free building blocks shared by the Concept app and the
+# command-line tools: reading the specification workbook, compiling it
+# into an immutable rule graph, caching the result as a snapshot and
+# auditing its structure.
+
+from .audit import AuditReport, DomainAudit, run_audit
+from .rules import DomainRules, Question, RuleGraph, compile_rules
+from .spec import Spec, compile_spec, load_spec, read_spec, spec_hash
+
+__all__ = [
+    "AuditReport",
+    "DomainAudit",
+    "DomainRules",
+    "Question",
+    "RuleGraph",
+    "Spec",
+    "compile_rules",
+    "compile_spec",
+    "load_spec",
+    "read_spec",
+    "run_audit",
+    "spec_hash",
+]
@@ -0,0 +1,236 @@
+# ===============================================
+# Per-session answer store
+# ===============================================
+#
+# One compact object per session instead of two st.session_state keys per
+# question.  Entries are created the first time a question is answered,
+# so memory and per-rerun cost follow the questions a caseworker has
+# actually touched, not the size of the specification.
+#
+# Each domain keeps its visible questions in render order.  When one
+# answer changes only that question's subtree is re-evaluated; the form
+# falls back to a full rebuild when the subtree shares questions with
+# other branches, since those may need to move rather than disappear.
+# Answers are cleared only after that walk, for questions it no longer
+# shows, so the splice never works from answers that are about to go.
+
+from datetime import datetime, timezone
+
+
+class DomainForm:
+    """Answers and visible questions for one domain of one session.
+
+    ``order`` lists visible node ids in render order (depth-first from the
+    top-level questions, each node at most once) and ``depth`` holds the
+    nesting level of each entry.  Rule targets without a question row are
+    included so the app can flag them.  ``started`` is when the first
+    answer was given (UTC).
+    """
+
+    __slots__ = ("rules", "values", "order", "depth", "visible", "evaluated", "started")
+
+    def __init__(self, rules, build=True):
+        # build=False skips the walk for callers that load() straight away
+        self.rules = rules
+        self.values = {}
+        self.evaluated = 0
+        self.started = None
+        if build:
+            self.rebuild()
+        else:
+            self.visible, self.order, self.depth = set(), [], []
+
+    def get(self, node, default=None):
+        return self.values.get(node, default)
+
+    def next_nodes(self, node):
+        if node >= self.rules.n_questions:
+            return ()
+        return self.rules.next_nodes(node, self.values.get(node))
+
+    def walk(self, starts, level, taken):
+        """Depth-first visible nodes below ``starts``, skipping ``taken``.
+
+        Returns ``(order, depth, skipped)`` where ``skipped`` holds nodes
+        that were reachable but already shown elsewhere.
+        """
+        rules = self.rules
+        next_nodes, n_questions, values = rules.next_nodes, rules.n_questions, self.values
+        order, depth, skipped = [], [], set()
+        stack = [(node, level) for node in reversed(starts)]
+        evaluated = 0
+        while stack:
+            node, d = stack.pop()
+            evaluated += 1
+            if node in taken:
+                skipped.add(node)
+                continue
+            taken.add(node)
+            order.append(node)
+            depth.append(d)
+            if node < n_questions:
+                children = next_nodes(node, values.get(node))
+                if children:
+                    stack.extend([(c, d + 1) for c in reversed(children)])
+        self.evaluated += evaluated
+        return order, depth, skipped
+
+    def rebuild(self):
+        self.visible = set()
+        roots = [r for r in self.rules.top]
+        self.order, self.depth, _ = self.walk(roots, 0, self.visible)
+
+    def is_shared(self, node):
+        parents = self.rules.parents[node]
+        return len(parents) > 1 and len({p for p, _ in parents}) > 1
+
+    def answer(self, node, value):
+        """Record ``value`` for ``node`` and update visibility.
+
+        Returns the nodes whose answers were cleared because they are no
+        longer shown.
+        """
+        if node in self.values and self.values[node] == value:
+            return ()
+        if self.started is None:
+            self.started = datetime.now(timezone.utc)
+        self.values[node] = value
+        if node not in self.visible:
+            return ()
+
+        self.update(node)
+
+        # A question still shown under another parent keeps its answer, and
+        # the questions leading to ``node`` stay shown whatever it answers.
+        # Hidden answers do not affect visibility, so one pass is enough.
+        stale = [n for n in self.values if n not in self.visible]
+        for n in stale:
+            del self.values[n]
+        return stale
+
+    def update(self, node):
+        """Re-walk the subtree of visible ``node`` after its answer changed."""
+        start = self.order.index(node)
+        level = self.depth[start]
+        end = start + 1
+        while end < len(self.order) and self.depth[end] > level:
+            end += 1
+
+        old = set(self.order[start + 1:end])
+        taken = self.visible - old
+        order, depth, skipped = self.walk(self.next_nodes(node), level + 1, taken)
+
+        if any(self.is_shared(n) for n in old.union(order, skipped)):
+            self.rebuild()
+        else:
+            self.order[start + 1:end] = order
+            self.depth[start + 1:end] = depth
+            self.visible = taken
+
+    def load(self, answers):
+        """Set every answer at once from ``(field_ref, value)`` pairs.
+
+        Answers whose question ends up hidden are dropped, as if the
+        caseworker had changed the parent answer and the app had cleared
+        them; this repeats until the visible set is stable.  Returns the
+        refs that were dropped, including refs with no question.
+        """
+        ids = self.rules.ids
+        n_questions = self.rules.n_questions
+        questions = self.rules.questions
+        values = {}
+        dropped = []
+        for ref, value in answers:
+            node = ids.get(ref)
+            if node is None or node >= n_questions:
+                dropped.append(ref)
+            elif value is not None:
+                # Saved referrals hold numbers and dates as JSON text
+                value = questions[node].widget.coerce(value)
+                if value is not None:
+                    values[node] = value
+
+        self.values = values
+        self.rebuild()
+        while not self.visible.issuperset(self.values):
+            hidden = [node for node in self.values if node not in self.visible]
+            dropped.extend(self.rules.refs[node] for node in hidden)
+            for node in hidden:
+                del self.values[node]
+            self.rebuild()
+        return dropped
+
+    def steps(self, size, by_section=True):
+        """Split ``order`` into ``(start, end)`` slices of at most ``size`` entries.
+
+        With ``by_section`` a step also ends where the section changes, so
+        each step shows part of one section.  Rule targets without a
+        question stay with the entry before them.
+        """
+        questions = self.rules.questions
+        n_questions = self.rules.n_questions
+        steps = []
+        start, section = 0, None
+        for i, node in enumerate(self.order):
+            if node >= n_questions:
+                continue
+            new_section = by_section and questions[node].section != section
+            if i > start and (i - start >= size or new_section):
+                steps.append((start, i))
+                start = i
+            section = questions[node].section
+        if start < len(self.order):
+            steps.append((start, len(self.order)))
+        return steps
+
+    def frontier(self, limit):
+        """Positions in ``order`` of up to ``limit`` unanswered questions."""
+        n_questions = self.rules.n_questions
+        found = []
+        for i, node in enumerate(self.order):
+            if node < n_questions and self.values.get(node) is None:
+                found.append(i)
+                if len(found) == limit:
+                    break
+        return found
+
+    def path(self):
+        """``(field_ref, answer)`` for each visible answered question, in order."""
+        refs = self.rules.refs
+        return [
+            (refs[node], self.values[node])
+            for node in self.order
+            if self.values.get(node) is not None
+        ]
+
+
+class AnswerStore:
+    """All domain forms of one session.
+
+    ``generation`` is baked into widget keys: bumping it on reset gives
+    every widget a fresh key, so Streamlit drops the old widget state
+    without the app touching each key.
+    """
+
+    __slots__ = ("generation", "forms")
+
+    def __init__(self):
+        self.generation = 0
+        self.forms = {}
+
+    def widget_key(self, domain, field_ref):
+        return f"{domain}__{field_ref}__{self.generation}"
+
+    def form(self, domain, rules):
+        """The :class:`DomainForm` for ``domain``, created on first use."""
+        form = self.forms.get(domain)
+        if form is None or form.rules is not rules:
+            form = self.forms[domain] = DomainForm(rules)
+        return form
+
+    def reset(self):
+        self.generation += 1
+        self.forms = {}
+
+    def __len__(self):
+        return sum(len(f.values) for f in self.forms.values())
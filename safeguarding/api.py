@@ -0,0 +1,365 @@
+# ===============================================
+# REST/JSON evaluation API
+# ===============================================
+#
+#   python -m safeguarding.api "Data/<workbook>.xlsx" --port 8600 --workers 4
+#
+# Lets other systems pre-screen a referral against the same compiled rules
+# as the app: given a set of answers, which questions are shown, which are
+# still to answer and whether the path is complete.  Answers go through
+# DomainForm exactly as in the form and in replay, so answers to
+# questions that are no longer shown are dropped, not matched.
+#
+#   GET  /health
+#   GET  /domains
+#   GET  /domains/{domain}/questions/{field_ref}
+#   POST /domains/{domain}/evaluate   {"answers": {"TA01": "18+ years", ...}}
+#   POST /evaluate                    {"referrals": [{"id", "domain", "answers"}, ...]}
+#
+# "answers" may also be a list of [field_ref, answer] pairs.  Answers the
+# form could not have given (a choice outside the question's options, a
+# number or date that does not parse) are a 400 listing them under
+# "invalid"; answers to unknown questions are reported as dropped.
+#
+# Evaluation takes well under a millisecond, so handlers run it inline on
+# the event loop.  Several workers map one packed copy of the rules
+# (shared.py), and the workbook is hot-reloaded as in the app.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from .reload import SpecWatcher
+from .replay import replay_one
+from .shared import SHARED_ENV, shared_enabled
+from .widgets import CHOICE_KINDS, DATE, NUMERIC
+
+SPEC_ENV = "SAFEGUARDING_SPEC"
+MAX_BATCH = 1000
+
+
+class BadRequest(Exception):
+    """A 400; ``invalid`` lists offending ``[field_ref, answer]`` pairs."""
+
+    def __init__(self, message, invalid=()):
+        super().__init__(message)
+        self.invalid = invalid
+
+
+def question_info(q):
+    return {
+        "field_ref": q.field_ref,
+        "text": q.text,
+        "section": q.section,
+        "answer_type": q.answer_type,
+        "options": list(q.options),
+    }
+
+
+def parse_answers(answers):
+    """``(field_ref, answer)`` pairs from a JSON object or list of pairs."""
+    if isinstance(answers, dict):
+        return list(answers.items())
+    if isinstance(answers, list) and all(
+        isinstance(pair, list) and len(pair) == 2 and isinstance(pair[0], str) for pair in answers
+    ):
+        return [tuple(pair) for pair in answers]
+    raise BadRequest('"answers" must be an object or a list of [field_ref, answer] pairs')
+
+
+def invalid_answers(dr, pairs):
+    """``[field_ref, answer]`` pairs the question's widget could not produce."""
+    invalid = []
+    for ref, value in pairs:
+        q = dr.question(ref)
+        if q is None or value is None:
+            continue
+        widget = q.widget
+        if isinstance(value, (dict, list)):
+            ok = False
+        elif widget.kind in CHOICE_KINDS:
+            ok = widget.coerce(value) in widget.options
+        elif widget.kind in (NUMERIC, DATE):
+            ok = widget.coerce(value) is not None
+        else:
+            ok = True
+        if not ok:
+            invalid.append([ref, value])
+    return invalid
+
+
+def evaluate(rules, domain, answers, id=None):
+    """What the form shows for ``answers`` in ``domain``, as a JSON-ready dict."""
+    dr = rules[domain]
+    pairs = parse_answers(answers)
+    invalid = invalid_answers(dr, pairs)
+    if invalid:
+        refs = ", ".join(ref for ref, _ in invalid)
+        raise BadRequest(f"answers the form does not allow: {refs}", invalid)
+    result = replay_one(rules, (id, domain, pairs))
+    return {
+        "id": id,
+        "domain": domain,
+        "complete": not result.unanswered and not result.missing,
+        "path": [list(step) for step in result.path],
+        "next": [question_info(dr.question(ref)) for ref in result.unanswered],
+        "missing": list(result.missing),
+        "dropped": list(result.dropped),
+    }
+
+
+def error(status, message, invalid=()):
+    body = {"error": message}
+    if invalid:
+        body["invalid"] = invalid
+    return JSONResponse(body, status_code=status)
+
+
+async def http_error(request, exc):
+    # Unknown routes and methods answer in JSON like everything else
+    return error(exc.status_code, exc.detail)
+
+
+async def read_json(request):
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise BadRequest("request body is not valid JSON") from None
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be a JSON object")
+    return body
+
+
+def create_app(path=None, shared=None, snapshot_dir=None):
+    """The Starlette app for ``path`` (default: the SAFEGUARDING_SPEC workbook)."""
+    path = path or os.environ[SPEC_ENV]
+    watcher = SpecWatcher(
+        path, snapshot_dir=snapshot_dir, shared=shared_enabled() if shared is None else shared
+    )
+
+    async def health(request):
+        spec = watcher.current
+        return JSONResponse({
+            "status": "ok",
+            "version": spec.version,
+            "errors": watcher.report.errors,
+            "reloads": watcher.reloads,
+        })
+
+    async def domains(request):
+        rules = watcher.current.rules
+        return JSONResponse({
+            "version": rules.version,
+            "domains": [
+                {
+                    "domain": name,
+                    "questions": rules[name].n_questions,
+                    "top": list(rules[name].top_refs()),
+                }
+                for name in rules
+            ],
+        })
+
+    async def question(request):
+        rules = watcher.current.rules
+        domain = request.path_params["domain"]
+        if domain not in rules:
+            return error(404, f"unknown domain: {domain}")
+        q = rules[domain].question(request.path_params["field_ref"])
+        if q is None:
+            return error(404, f"unknown question: {request.path_params['field_ref']}")
+        return JSONResponse(question_info(q))
+
+    async def evaluate_one(request):
+        # One spec per request, so a reload mid-request cannot mix versions
+        rules = watcher.current.rules
+        domain = request.path_params["domain"]
+        if domain not in rules:
+            return error(404, f"unknown domain: {domain}")
+        try:
+            body = await read_json(request)
+            result = evaluate(rules, domain, body.get("answers", {}), body.get("id"))
+        except BadRequest as exc:
+            return error(400, str(exc), exc.invalid)
+        result["version"] = rules.version
+        return JSONResponse(result)
+
+    async def evaluate_batch(request):
+        rules = watcher.current.rules
+        try:
+            body = await read_json(request)
+            referrals = body.get("referrals")
+            if not isinstance(referrals, list):
+                raise BadRequest('"referrals" must be a list')
+            if len(referrals) > MAX_BATCH:
+                raise BadRequest(f"at most {MAX_BATCH} referrals per request")
+            results = []
+            for i, item in enumerate(referrals):
+                domain = item.get("domain") if isinstance(item, dict) else None
+                if not isinstance(domain, str) or domain not in rules:
+                    raise BadRequest(f"referral {i}: unknown or missing domain")
+                try:
+                    results.append(
+                        evaluate(rules, domain, item.get("answers", {}), item.get("id"))
+                    )
+                except BadRequest as exc:
+                    raise BadRequest(f"referral {i}: {exc}", exc.invalid) from None
+        except BadRequest as exc:
+            return error(400, str(exc), exc.invalid)
+        return JSONResponse({"version": rules.version, "results": results})
+
+    app = Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/domains", domains),
+            Route("/domains/{domain}/questions/{field_ref}", question),
+            Route("/domains/{domain}/evaluate", evaluate_one, methods=["POST"]),
+            Route("/evaluate", evaluate_batch, methods=["POST"]),
+        ],
+        exception_handlers={HTTPException: http_error},
+    )
+    app.state.watcher = watcher
+    return app
+
+
+# -----------------------------
+# In-process client
+# -----------------------------
+class LocalClient:
+    """Calls an ASGI app directly, without a socket; for tests and benchmarks.
+
+    ``get``/``post`` return ``(status, decoded JSON body)``.
+    """
+
+    __slots__ = ("app", "loop")
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.close()
+
+    def get(self, url):
+        return self.loop.run_until_complete(self.request("GET", url))
+
+    def post(self, url, data):
+        return self.loop.run_until_complete(self.request("POST", url, data))
+
+    async def request(self, method, url, data=None):
+        body = b"" if data is None else json.dumps(data).encode("utf-8")
+        path, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"host", b"local")],
+            "client": ("127.0.0.1", 0),
+            "server": ("local", 80),
+        }
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status, chunks = None, []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        raw = b"".join(chunks)
+        return status, json.loads(raw) if raw else None
+
+
+def serve(sockets=None, host=None, port=None):
+    import uvicorn
+
+    config = uvicorn.Config(
+        "safeguarding.api:create_app",
+        factory=True,
+        host=host or "127.0.0.1",
+        port=port or 8600,
+        log_level="warning",
+        access_log=False,
+    )
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m safeguarding.api",
+        description="Serve the safeguarding rules as a JSON evaluation API.",
+    )
+    parser.add_argument("workbook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # Workers are separate processes: they find the workbook through the
+    # environment and, when there are several, map one shared rules file
+    os.environ[SPEC_ENV] = os.path.abspath(args.workbook)
+    if args.workers <= 1:
+        serve(host=args.host, port=args.port)
+        return
+    os.environ.setdefault(SHARED_ENV, "1")
+
+    # One listening socket shared by every worker.  Bound here with an
+    # explicit protocol because asyncio only turns on TCP_NODELAY for
+    # sockets whose proto is IPPROTO_TCP; uvicorn's own --workers socket is
+    # not, which costs every keep-alive response a 40 ms delayed ACK.
+    family, kind, proto, _, address = socket.getaddrinfo(
+        args.host, args.port, type=socket.SOCK_STREAM
+    )[0]
+    sock = socket.socket(family, kind, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=serve, args=([sock],), name=f"api-worker-{i}")
+        for i in range(args.workers)
+    ]
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
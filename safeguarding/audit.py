@@ -0,0 +1,186 @@
+# ===============================================
+# Rule audit
+# ===============================================
+#
+# Structural checks over a compiled RuleGraph.  The results are plain
+# tuples so an AuditReport can be cached per specification version and
+# rendered by the app or serialised by the command-line tools.  Every
+# check is linear in the size of the graph.
+
+from .graph import strongly_connected_components
+
+# Answer types whose value is typed rather than picked from answer_options
+OPEN_ANSWER_TYPES = ("free_text", "numeric", "date")
+
+
+def find_top_level(dr):
+    """Questions no rule points to, i.e. where the form starts."""
+    return sorted(dr.top_refs())
+
+
+def find_missing_targets(dr):
+    """Rule targets with no matching question row."""
+    return list(dr.missing)
+
+
+def find_ambiguous_rules(dr):
+    """``(field_ref, answer)`` pairs that lead to more than one question."""
+    return list(dr.ambiguous)
+
+
+def find_cycles(dr):
+    """Groups of questions that can lead back to themselves."""
+    cycles = []
+    for component in strongly_connected_components(len(dr.refs), dr.children):
+        if len(component) > 1 or component[0] in dr.children[component[0]]:
+            cycles.append(tuple(sorted(dr.refs[v] for v in component)))
+    return sorted(cycles)
+
+
+def find_unreachable(dr):
+    """Questions that cannot be reached from any top-level question."""
+    seen = [False] * len(dr.refs)
+    stack = list(dr.top)
+    for v in stack:
+        seen[v] = True
+    while stack:
+        for w in dr.children[stack.pop()]:
+            if not seen[w]:
+                seen[w] = True
+                stack.append(w)
+    return sorted(dr.refs[v] for v in range(dr.n_questions) if not seen[v])
+
+
+def choice_questions(dr):
+    for q in dr.questions:
+        if q.options and q.answer_type not in OPEN_ANSWER_TYPES:
+            yield q
+
+
+def find_unrouted_options(dr):
+    """``(field_ref, option)`` pairs offered to the user with no rule row."""
+    issues = []
+    for q in choice_questions(dr):
+        answers = {answer for answer, _ in dr.edges[q.node]}
+        issues.extend((q.field_ref, o) for o in q.options if o not in answers)
+    return sorted(issues)
+
+
+def find_unknown_answers(dr):
+    """``(field_ref, answer)`` rule rows whose answer is not an offered option."""
+    issues = set()
+    for q in choice_questions(dr):
+        options = set(q.options)
+        issues.update(
+            (q.field_ref, answer) for answer, _ in dr.edges[q.node] if answer not in options
+        )
+    return sorted(issues)
+
+
+def find_invalid_answers(dr):
+    """``(field_ref, answer)`` rules on numeric or date questions that no value can match."""
+    return list(dr.invalid)
+
+
+# (attribute, label, severity) for every check in a DomainAudit
+CHECKS = (
+    ("top_level", "Top-level questions", "info"),
+    ("missing_targets", "Missing rule targets", "error"),
+    ("ambiguous_rules", "Ambiguous rules", "error"),
+    ("cycles", "Rule cycles", "error"),
+    ("unknown_answers", "Rule answers not in answer_options", "error"),
+    ("invalid_answers", "Rule answers that are not a number, date or range", "error"),
+    ("unreachable", "Unreachable questions", "warning"),
+    ("unrouted_options", "Options with no rule (dead ends)", "warning"),
+)
+
+
+class DomainAudit:
+    """Audit results for one domain."""
+
+    __slots__ = ("domain",) + tuple(attr for attr, _, _ in CHECKS)
+
+    def __init__(self, domain, **results):
+        self.domain = domain
+        for attr, _, _ in CHECKS:
+            setattr(self, attr, tuple(results.get(attr, ())))
+
+    def count(self, severity):
+        return sum(len(getattr(self, attr)) for attr, _, sev in CHECKS if sev == severity)
+
+    @property
+    def errors(self):
+        return self.count("error")
+
+    @property
+    def warnings(self):
+        return self.count("warning")
+
+    def to_dict(self):
+        data = {"domain": self.domain}
+        for attr, _, _ in CHECKS:
+            data[attr] = [list(i) if isinstance(i, tuple) else i for i in getattr(self, attr)]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["domain"], **{
+            attr: [tuple(i) if isinstance(i, list) else i for i in data[attr]]
+            for attr, _, _ in CHECKS
+        })
+
+
+class AuditReport:
+    """Audit results for every domain of one specification version."""
+
+    __slots__ = ("version", "domains")
+
+    def __init__(self, version, domains):
+        self.version = version
+        self.domains = domains
+
+    def __getitem__(self, domain):
+        return self.domains[domain]
+
+    def __iter__(self):
+        return iter(self.domains.values())
+
+    @property
+    def errors(self):
+        return sum(d.errors for d in self.domains.values())
+
+    @property
+    def warnings(self):
+        return sum(d.warnings for d in self.domains.values())
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "domains": [d.to_dict() for d in self.domains.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        domains = [DomainAudit.from_dict(d) for d in data["domains"]]
+        return cls(data["version"], {d.domain: d for d in domains})
+
+
+def audit_domain(dr):
+    return DomainAudit(
+        dr.name,
+        top_level=find_top_level(dr),
+        missing_targets=find_missing_targets(dr),
+        ambiguous_rules=find_ambiguous_rules(dr),
+        cycles=find_cycles(dr),
+        unknown_answers=find_unknown_answers(dr),
+        invalid_answers=find_invalid_answers(dr),
+        unreachable=find_unreachable(dr),
+        unrouted_options=find_unrouted_options(dr),
+    )
+
+
+def run_audit(rules):
+    """Audit every domain of a :class:`~safeguarding.rules.RuleGraph`."""
+    return AuditReport(rules.version, {name: audit_domain(rules[name]) for name in rules})
@@ -0,0 +1,237 @@
+# ===============================================
+# Specification diff
+# ===============================================
+#
+#   python -m safeguarding.diff "Data/<old>.xlsx" "Data/<new>.xlsx" --format json
+#
+# Compares two compiled RuleGraphs domain by domain: questions added,
+# removed or reworded, answer options added or removed, and rule edges
+# added or removed.  Each side is reduced to dicts and sets of plain
+# tuples, so a comparison is a handful of hashed set operations however
+# large the specifications are.  Exits 1 when the versions differ, like
+# diff(1).
+
+import argparse
+import json
+import sys
+import time
+
+from .spec import load_spec
+
+END = "END"
+
+# (attribute, label) for every kind of change, in report order
+CHANGES = (
+    ("added_questions", "Questions added"),
+    ("removed_questions", "Questions removed"),
+    ("changed_questions", "Questions changed"),
+    ("added_options", "Options added"),
+    ("removed_options", "Options removed"),
+    ("added_edges", "Rules added"),
+    ("removed_edges", "Rules removed"),
+)
+
+# Column names for the items of each kind of change
+COLUMNS = {
+    "added_questions": ("field_ref",),
+    "removed_questions": ("field_ref",),
+    "changed_questions": ("field_ref", "field", "old", "new"),
+    "added_options": ("field_ref", "option"),
+    "removed_options": ("field_ref", "option"),
+    "added_edges": ("field_ref", "answer_value", "next_field_ref"),
+    "removed_edges": ("field_ref", "answer_value", "next_field_ref"),
+}
+
+# Question fields compared for changed_questions
+QUESTION_FIELDS = ("text", "answer_type", "section")
+
+
+def question_map(dr):
+    """``field_ref -> Question`` for every question in ``dr`` (may be ``None``)."""
+    if dr is None:
+        return {}
+    return {q.field_ref: q for q in dr.questions}
+
+
+def edge_set(dr):
+    """Rules as ``(field_ref, answer, target_ref)``; ``END`` marks no target."""
+    if dr is None:
+        return set()
+    refs = dr.refs
+    return {
+        (refs[node], answer, END if child is None else refs[child])
+        for node, node_edges in enumerate(dr.edges)
+        for answer, child in node_edges
+    }
+
+
+def diff_domain(name, old, new):
+    """Compare two :class:`DomainRules`; either side may be ``None``."""
+    old_q = question_map(old)
+    new_q = question_map(new)
+    common = old_q.keys() & new_q.keys()
+
+    changed = []
+    added_options = []
+    removed_options = []
+    for ref in sorted(common):
+        a, b = old_q[ref], new_q[ref]
+        for field in QUESTION_FIELDS:
+            if getattr(a, field) != getattr(b, field):
+                changed.append((ref, field, getattr(a, field), getattr(b, field)))
+        if a.options != b.options:
+            old_opts, new_opts = set(a.options), set(b.options)
+            added_options.extend((ref, o) for o in b.options if o not in old_opts)
+            removed_options.extend((ref, o) for o in a.options if o not in new_opts)
+
+    old_edges = edge_set(old)
+    new_edges = edge_set(new)
+    return DomainDiff(
+        name,
+        added_questions=sorted(new_q.keys() - old_q.keys()),
+        removed_questions=sorted(old_q.keys() - new_q.keys()),
+        changed_questions=changed,
+        added_options=added_options,
+        removed_options=removed_options,
+        added_edges=sorted(new_edges - old_edges),
+        removed_edges=sorted(old_edges - new_edges),
+    )
+
+
+class DomainDiff:
+    """Changes to one domain between two specification versions."""
+
+    __slots__ = ("domain",) + tuple(attr for attr, _ in CHANGES)
+
+    def __init__(self, domain, **changes):
+        self.domain = domain
+        for attr, _ in CHANGES:
+            setattr(self, attr, tuple(changes.get(attr, ())))
+
+    @property
+    def total(self):
+        return sum(len(getattr(self, attr)) for attr, _ in CHANGES)
+
+    def __bool__(self):
+        return self.total > 0
+
+    def to_dict(self):
+        data = {"domain": self.domain}
+        for attr, _ in CHANGES:
+            data[attr] = [list(i) if isinstance(i, tuple) else i for i in getattr(self, attr)]
+        return data
+
+
+class SpecDiff:
+    """Per-domain changes from ``old_version`` to ``new_version``."""
+
+    __slots__ = ("old_version", "new_version", "domains")
+
+    def __init__(self, old_version, new_version, domains):
+        self.old_version = old_version
+        self.new_version = new_version
+        self.domains = domains
+
+    def __getitem__(self, domain):
+        return self.domains[domain]
+
+    def __iter__(self):
+        return iter(self.domains.values())
+
+    @property
+    def total(self):
+        return sum(d.total for d in self)
+
+    def __bool__(self):
+        return self.total > 0
+
+    def to_dict(self):
+        return {
+            "old_version": self.old_version,
+            "new_version": self.new_version,
+            "total": self.total,
+            "domains": [d.to_dict() for d in self],
+        }
+
+
+def diff_rules(old, new):
+    """Compare two :class:`RuleGraph` objects, domain by domain."""
+    names = list(old) + [name for name in new if name not in old]
+    domains = {
+        name: diff_domain(
+            name,
+            old[name] if name in old else None,
+            new[name] if name in new else None,
+        )
+        for name in names
+    }
+    return SpecDiff(old.version, new.version, domains)
+
+
+# -----------------------------
+# Command line
+# -----------------------------
+def format_item(attr, item):
+    if attr == "changed_questions":
+        ref, field, before, after = item
+        return f"{ref} {field}: {before!r} -> {after!r}"
+    if attr.endswith("_edges"):
+        ref, answer, target = item
+        return f"{ref} [{answer}] -> {target}"
+    return " ".join(item) if isinstance(item, tuple) else str(item)
+
+
+def render_text(diff, elapsed):
+    lines = []
+    for result in diff:
+        lines.append(f"[{result.domain}] {result.total} change(s)")
+        for attr, label in CHANGES:
+            items = getattr(result, attr)
+            if items:
+                lines.append(f"  {label} ({len(items)})")
+                lines.extend(f"    - {format_item(attr, i)}" for i in items)
+    lines.append(f"{diff.total} change(s) in {elapsed * 1000:.1f} ms")
+    return "\n".join(lines)
+
+
+def render_json(diff, elapsed):
+    data = diff.to_dict()
+    data["elapsed_ms"] = round(elapsed * 1000, 3)
+    return json.dumps(data, indent=2)
+
+
+RENDERERS = {
+    "text": render_text,
+    "json": render_json,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m safeguarding.diff",
+        description="Compare the rules in two safeguarding specification workbooks.",
+    )
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--format", choices=tuple(RENDERERS), default="text")
+    parser.add_argument("--output", "-o", help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    old = load_spec(args.old).rules
+    new = load_spec(args.new).rules
+    start = time.perf_counter()
+    diff = diff_rules(old, new)
+    elapsed = time.perf_counter() - start
+
+    output = RENDERERS[args.format](diff, elapsed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+    return 1 if diff else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# ===============================================
+# Graph algorithms over compiled rules
+# ===============================================
+#
+# Iterative implementations only: specifications can be deep enough to
+# exhaust Python's recursion limit, and rules may contain cycles.
+
+
+def strongly_connected_components(n, successors):
+    """Tarjan's algorithm over nodes ``0..n-1``.
+
+    ``successors[v]`` is an iterable of node ids.  Components are returned
+    in reverse topological order (sinks first).
+    """
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+
+    for start in range(n):
+        if index[start] != -1:
+            continue
+        work = [(start, iter(successors[start]))]
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+
+        while work:
+            v, it = work[-1]
+            advanced = False
+            for w in it:
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(successors[w])))
+                    advanced = True
+                    break
+                if on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            if advanced:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
@@ -0,0 +1,179 @@
+# ===============================================
+# Linear rule map
+# ===============================================
+#
+# Top-down, indented text view of one domain's rules, meant for reading
+# and printing.  Each question is expanded once; later references point
+# back to it, so the output is linear in the size of the graph and there
+# is no depth limit.  The walk is an explicit stack yielding one line at
+# a time, so deep or cyclic specs neither recurse nor buffer.
+#
+# Renderers: plain text (as shown in the app), Markdown (nested lists)
+# and PDF (A4, Courier, no dependencies).
+
+import zlib
+
+from .audit import find_top_level
+
+# Entry kinds yielded by walk_rule_map
+ROOT, QUESTION, SEEN, BRANCH, END, GAP = "root", "question", "seen", "branch", "end", "gap"
+
+
+def walk_rule_map(dr):
+    """Yield ``(kind, depth, ref, answer, text)`` entries in reading order."""
+    seen = set()
+    for root in find_top_level(dr):
+        yield ROOT, 0, root, None, None
+        stack = [(QUESTION, 1, dr.ids[root], None)]
+        while stack:
+            kind, depth, node, answer = stack.pop()
+            if kind == END:
+                yield END, depth, None, answer, None
+                continue
+            if kind == BRANCH:
+                yield BRANCH, depth, None, answer, None
+                stack.append((QUESTION, depth + 1, node, None))
+                continue
+
+            ref = dr.refs[node]
+            if node in seen:
+                yield SEEN, depth, ref, None, None
+                continue
+            seen.add(node)
+            text = dr.questions[node].text if node < dr.n_questions else ""
+            yield QUESTION, depth, ref, None, text
+
+            # Pushed in reverse so answers come out in sheet order
+            for answer, child in reversed(dr.edges[node]):
+                if child is None:
+                    stack.append((END, depth + 1, None, answer))
+                else:
+                    stack.append((BRANCH, depth + 1, child, answer))
+        yield GAP, 0, None, None, None
+
+
+def iter_text(dr):
+    """The map as plain text lines, one at a time."""
+    for kind, depth, ref, answer, text in walk_rule_map(dr):
+        pad = "  " * depth
+        if kind == ROOT:
+            yield f"=== {ref} ==="
+        elif kind == QUESTION:
+            yield f"{pad}■ {ref}: {text}"
+        elif kind == SEEN:
+            yield f"{pad}↪ {ref} (already shown)"
+        elif kind == BRANCH:
+            yield f"{pad}─ [{answer}] →"
+        elif kind == END:
+            yield f"{pad}─ [{answer}] → END"
+        else:
+            yield ""
+
+
+def render_text(dr):
+    return "\n".join(iter_text(dr))
+
+
+def render_markdown(dr, title=None):
+    lines = [f"# {title}", ""] if title else []
+    for kind, depth, ref, answer, text in walk_rule_map(dr):
+        pad = "  " * (depth - 1)
+        if kind == ROOT:
+            lines.append(f"## {ref}")
+            lines.append("")
+        elif kind == QUESTION:
+            lines.append(f"{pad}- **{ref}**: {text}" if text else f"{pad}- **{ref}**")
+        elif kind == SEEN:
+            lines.append(f"{pad}- ↪ {ref} (already shown)")
+        elif kind == BRANCH:
+            lines.append(f"{pad}- [{answer}] →")
+        elif kind == END:
+            lines.append(f"{pad}- [{answer}] → END")
+        else:
+            lines.append("")
+    return "\n".join(lines)
+
+
+# -----------------------------
+# PDF
+# -----------------------------
+A4 = (595, 842)
+MARGIN = 40
+FONT_SIZE = 8
+LEADING = 10
+# Courier glyphs are 0.6 em wide
+CHARS_PER_LINE = int((A4[0] - 2 * MARGIN) / (FONT_SIZE * 0.6))
+LINES_PER_PAGE = int((A4[1] - 2 * MARGIN) / LEADING)
+
+# The built-in PDF fonts only cover Latin-1
+PDF_SYMBOLS = {"■": "#", "─": "-", "→": "->", "↪": "~>", "–": "-", "—": "-", "’": "'", "‘": "'", "“": '"', "”": '"'}
+
+
+def pdf_text(line):
+    for symbol, plain in PDF_SYMBOLS.items():
+        line = line.replace(symbol, plain)
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def wrap_line(line):
+    """Split ``line`` to the page width and at embedded newlines.
+
+    Continuations are indented under the start of the line.
+    """
+    # Capped so very deep lines still make progress on every row
+    indent = " " * min(len(line) - len(line.lstrip()) + 4, CHARS_PER_LINE // 2)
+    first, *rest = line.split("\n")
+    parts = []
+    for segment in [first] + [indent + r.strip() for r in rest]:
+        while len(segment) > CHARS_PER_LINE:
+            parts.append(segment[:CHARS_PER_LINE])
+            segment = indent + segment[CHARS_PER_LINE:]
+        parts.append(segment)
+    return parts
+
+
+def render_pdf(lines, title=None):
+    """A4 PDF bytes listing ``lines`` in Courier, wrapped and paginated."""
+    wrapped = [title, ""] if title else []
+    for line in lines:
+        wrapped.extend(wrap_line(line))
+    pages = [wrapped[i:i + LINES_PER_PAGE] for i in range(0, len(wrapped), LINES_PER_PAGE)] or [[]]
+
+    # Object ids: 1 catalog, 2 page tree, 3 font, then a page and its
+    # content stream per page
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for i, page in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        body = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {A4[1] - MARGIN} Td"]
+        body.extend(f"({pdf_text(line)}) '" for line in page)
+        body.append("ET")
+        stream = zlib.compress("\n".join(body).encode("latin-1"))
+        objects[content_id] = (
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode()
+            + stream
+            + b"\nendstream"
+        )
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {A4[0]} {A4[1]}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    count = max(objects) + 1
+    out += f"xref\n0 {count}\n0000000000 65535 f \n".encode()
+    for obj_id in range(1, count):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
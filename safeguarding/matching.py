@@ -0,0 +1,116 @@
+# ===============================================
+# Typed answer matching
+# ===============================================
+#
+# Rule answers are parsed once at compile time into keys of the same type
+# the form stores (see widgets.COERCERS): strings for choice and text
+# questions, floats for numeric questions and dates for date questions.
+# "What comes next?" is then a dict lookup on the answer itself, with no
+# string built per comparison, and numbers and dates match however the
+# sheet or the widget happened to format them.
+#
+# Numeric and date questions may also branch on ranges:
+#
+#   <18   <=18   >65   >=65   18..64   2020-01-01..2024-12-31
+#
+# Ranges are inclusive unless written with < or >.  A placeholder answer
+# (the answer type itself, "(free text)", "any" or "*") matches every
+# answer given.
+
+import re
+
+from .widgets import CHOICE_KINDS, COERCERS, DATE, NUMERIC
+
+PLACEHOLDERS = ("any", "*", "(free text)", "free_text", "free text", "numeric", "date")
+
+COMPARISON = re.compile(r"^(<=|>=|<|>)\s*(.+)$")
+BETWEEN = re.compile(r"^(.+?)\s*\.\.\s*(.+)$")
+
+
+class Range:
+    """Answers between ``low`` and ``high``; either end may be ``None`` (open)."""
+
+    __slots__ = ("low", "high", "low_inclusive", "high_inclusive")
+
+    def __init__(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        self.low = low
+        self.high = high
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+
+    def __contains__(self, value):
+        if self.low is not None:
+            if value < self.low or (value == self.low and not self.low_inclusive):
+                return False
+        if self.high is not None:
+            if value > self.high or (value == self.high and not self.high_inclusive):
+                return False
+        return True
+
+    def __repr__(self):
+        return f"Range({self.low!r}, {self.high!r}, {self.low_inclusive}, {self.high_inclusive})"
+
+
+ANY = Range()
+
+
+def parse_answer(kind, answer):
+    """The key or :class:`Range` a rule answer matches, or ``None`` if invalid.
+
+    Choice questions match the answer text exactly.  Non-string answers,
+    such as numbers read straight from a sheet, are matched as their text.
+    """
+    if not isinstance(answer, str):
+        answer = str(answer)
+    if kind in CHOICE_KINDS:
+        return answer
+    text = answer.strip()
+    if text.lower() in PLACEHOLDERS:
+        return ANY
+    if kind not in (NUMERIC, DATE):
+        return text
+
+    coerce = COERCERS[kind]
+    match = COMPARISON.match(text)
+    if match:
+        op, bound = match.groups()
+        bound = coerce(bound)
+        if bound is None:
+            return None
+        if op[0] == "<":
+            return Range(high=bound, high_inclusive=op == "<=")
+        return Range(low=bound, low_inclusive=op == ">=")
+
+    # Tried before BETWEEN so that dates and decimals are not split
+    value = coerce(text)
+    if value is not None:
+        return value
+
+    match = BETWEEN.match(text)
+    if match:
+        low, high = (coerce(b) for b in match.groups())
+        if low is not None and high is not None:
+            return Range(low, high)
+    return None
+
+
+def compile_answers(kind, rules):
+    """Split ``(answer, targets)`` rules into an exact-match dict and ranges.
+
+    Returns ``(exact, ranges, invalid)``: ``exact`` maps a typed key to its
+    targets, ``ranges`` is a tuple of ``(Range, targets)`` and ``invalid``
+    lists answers that could not be parsed.
+    """
+    exact, ranges, invalid = {}, [], []
+    for answer, targets in rules:
+        key = parse_answer(kind, answer)
+        if key is None:
+            invalid.append(answer)
+        elif isinstance(key, Range):
+            ranges.append((key, targets))
+        elif key in exact:
+            # "5" and "5.0" are the same rule once typed
+            exact[key] = exact[key] + tuple(t for t in targets if t not in exact[key])
+        else:
+            exact[key] = targets
+    return exact, tuple(ranges), tuple(invalid)
@@ -0,0 +1,208 @@
+# ===============================================
+# Path statistics
+# ===============================================
+#
+# How many distinct referral paths a domain has, how long they are and
+# how often each question is asked, without enumerating a single path.
+#
+# A path runs from a top-level question, one answer at a time, to an END
+# rule or a question with no rules.  As in the app, a rule leading back
+# to a question already on the path ends it there.  Counts are dynamic
+# programmes over a depth-first postorder with those loop rules cut, so
+# every node and rule is visited once and counts are Python integers
+# however large they get.
+#
+# Counts are exact for loop-free rules.  With loops (an audit error in
+# any case) each loop rule is cut once for all paths rather than per
+# path, so totals can differ slightly from exhaustive enumeration, which
+# is #P-hard in general.
+
+from collections import deque
+
+
+class PathStats:
+    """Path counts and length statistics for one domain.
+
+    ``paths`` counts top-to-END paths; ``loops`` is True when some path
+    is cut short by a rule leading back to an earlier question.
+    ``lengths`` maps a path length (in questions) to its number of paths,
+    ``depths`` maps a question's shortest distance from the top to the
+    number of questions there, and ``coverage`` lists ``(field_ref,
+    paths_through, share)`` per reachable question, most-asked first.
+    """
+
+    __slots__ = (
+        "domain",
+        "paths",
+        "loops",
+        "by_root",
+        "longest",
+        "shortest",
+        "mean_length",
+        "lengths",
+        "depths",
+        "coverage",
+    )
+
+    def __init__(self, domain, paths, loops, by_root, longest, shortest,
+                 mean_length, lengths, depths, coverage):
+        self.domain = domain
+        self.paths = paths
+        self.loops = loops
+        self.by_root = by_root
+        self.longest = longest
+        self.shortest = shortest
+        self.mean_length = mean_length
+        self.lengths = lengths
+        self.depths = depths
+        self.coverage = coverage
+
+    def to_dict(self):
+        return {
+            "domain": self.domain,
+            "paths": self.paths,
+            "loops": self.loops,
+            "by_root": dict(self.by_root),
+            "longest": self.longest,
+            "shortest": self.shortest,
+            "mean_length": self.mean_length,
+            "lengths": dict(self.lengths),
+            "depths": dict(self.depths),
+            "coverage": [list(row) for row in self.coverage],
+        }
+
+
+def depth_first(dr):
+    """Postorder of every node and the set of ``(v, w)`` back edges.
+
+    Searches from the top-level questions first.  Without its back edges
+    the graph is acyclic and the postorder lists children before parents.
+    """
+    n = len(dr.refs)
+    state = [0] * n  # 0 unseen, 1 on the stack, 2 done
+    order = []
+    back = set()
+    for start in list(dr.top) + list(range(n)):
+        if state[start]:
+            continue
+        state[start] = 1
+        work = [(start, iter(dr.children[start]))]
+        while work:
+            v, it = work[-1]
+            for w in it:
+                if state[w] == 0:
+                    state[w] = 1
+                    work.append((w, iter(dr.children[w])))
+                    break
+                if state[w] == 1:
+                    back.add((v, w))
+            else:
+                state[v] = 2
+                order.append(v)
+                work.pop()
+    return order, back
+
+
+def question_depths(dr):
+    """Shortest distance of every reachable node from a top-level question."""
+    depth = {v: 0 for v in dr.top}
+    queue = deque(dr.top)
+    while queue:
+        v = queue.popleft()
+        for w in dr.children[v]:
+            if w not in depth:
+                depth[w] = depth[v] + 1
+                queue.append(w)
+    return depth
+
+
+def path_stats(dr):
+    """Compute :class:`PathStats` for one :class:`DomainRules`."""
+    n = len(dr.refs)
+    order, back = depth_first(dr)
+
+    paths = [0] * n        # paths from v to an end
+    loops = [False] * n    # some path from v is cut short by a loop
+    longest = [0] * n
+    shortest = [0] * n
+    hist = [None] * n      # hist[v][k]: paths from v with k questions
+
+    for v in order:
+        edges = dr.edges[v]
+        if not edges:
+            paths[v], longest[v], shortest[v], hist[v] = 1, 1, 1, [0, 1]
+            continue
+
+        count, low, high, h = 0, None, 0, [0]
+        for _, child in edges:
+            if child is None or (v, child) in back:
+                # END, or a question already shown on this path
+                c_paths, c_low, c_high, c_hist = 1, 0, 0, (1,)
+                if child is not None:
+                    loops[v] = True
+            else:
+                loops[v] = loops[v] or loops[child]
+                c_paths, c_low, c_high, c_hist = (
+                    paths[child], shortest[child], longest[child], hist[child]
+                )
+            count += c_paths
+            low = c_low + 1 if low is None else min(low, c_low + 1)
+            high = max(high, c_high + 1)
+            if len(h) < len(c_hist) + 1:
+                h.extend([0] * (len(c_hist) + 1 - len(h)))
+            for k, c in enumerate(c_hist):
+                h[k + 1] += c
+        paths[v], shortest[v], longest[v], hist[v] = count, low, high, h
+
+    roots = dr.top
+    by_root = {dr.refs[r]: paths[r] for r in roots}
+    total = sum(by_root.values())
+
+    lengths = {}
+    for r in roots:
+        for k, c in enumerate(hist[r]):
+            if c:
+                lengths[k] = lengths.get(k, 0) + c
+    length_sum = sum(k * c for k, c in lengths.items())
+
+    # Paths from the top into each node, parents before children
+    into = [0] * n
+    for r in roots:
+        into[r] = 1
+    for v in reversed(order):
+        if into[v]:
+            for _, child in dr.edges[v]:
+                if child is not None and (v, child) not in back:
+                    into[child] += into[v]
+
+    coverage = sorted(
+        (
+            (dr.refs[v], into[v] * paths[v], into[v] * paths[v] / total if total else 0.0)
+            for v in range(dr.n_questions)
+            if into[v]
+        ),
+        key=lambda row: (-row[1], row[0]),
+    )
+
+    depths = {}
+    for v, d in question_depths(dr).items():
+        if v < dr.n_questions:
+            depths[d] = depths.get(d, 0) + 1
+
+    return PathStats(
+        dr.name,
+        total,
+        any(loops[r] for r in roots),
+        by_root,
+        max((longest[r] for r in roots), default=0),
+        min((shortest[r] for r in roots), default=0),
+        length_sum / total if total else 0.0,
+        dict(sorted(lengths.items())),
+        dict(sorted(depths.items())),
+        tuple(coverage),
+    )
+
+
+def domain_path_stats(rules):
+    """``domain -> PathStats`` for every domain of a :class:`RuleGraph`."""
+    return {name: path_stats(rules[name]) for name in rules}
@@ -0,0 +1,245 @@
+# ===============================================
+# Submitted referrals: append-only store
+# ===============================================
+#
+# Submissions go onto a queue; a single writer thread drains the queue
+# and commits whole batches to SQLite (WAL mode), so many caseworkers
+# submitting together share one commit instead of each paying for their
+# own fsync.  Each submission gets a future that settles once its row is
+# committed or has finally failed, so nothing is reported as saved before
+# it is.  A failed batch is retried, then written row by row so one bad
+# row cannot take the rest with it.
+#
+# Rows are never updated or deleted: triggers reject both, and the store
+# exposes no way to do either.
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import closing
+from datetime import datetime, timezone
+
+from .timing import REGISTRY
+
+REFERRALS_FILE_ENV = "SAFEGUARDING_REFERRALS"
+REFERRALS_FILE = "referrals.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS referrals (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    id           TEXT NOT NULL UNIQUE,
+    domain       TEXT NOT NULL,
+    spec_version TEXT NOT NULL,
+    started_at   TEXT,
+    submitted_at TEXT NOT NULL,
+    path         TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS referrals_no_update
+BEFORE UPDATE ON referrals
+BEGIN SELECT RAISE(ABORT, 'referrals are append-only'); END;
+CREATE TRIGGER IF NOT EXISTS referrals_no_delete
+BEFORE DELETE ON referrals
+BEGIN SELECT RAISE(ABORT, 'referrals are append-only'); END;
+"""
+
+# Idempotent, so a referral submitted again after an unclear failure is
+# stored once
+INSERT = (
+    "INSERT INTO referrals (id, domain, spec_version, started_at, submitted_at, path) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO NOTHING"
+)
+
+
+class ReferralWriteError(Exception):
+    """A referral could not be written, even after retrying."""
+
+
+def utc_now():
+    return timestamp(datetime.now(timezone.utc))
+
+
+def timestamp(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="milliseconds")
+    return value
+
+
+def default_path(spec_path):
+    """``SAFEGUARDING_REFERRALS`` or ``referrals.sqlite3`` beside the workbook."""
+    return os.environ.get(REFERRALS_FILE_ENV) or os.path.join(
+        os.path.dirname(os.path.abspath(spec_path)), REFERRALS_FILE
+    )
+
+
+class Referral:
+    """One submitted referral: the answered path through a domain's form.
+
+    ``path`` is a list of ``(field_ref, answer)`` pairs in the order the
+    questions were shown.
+    """
+
+    __slots__ = ("id", "domain", "spec_version", "started_at", "submitted_at", "path")
+
+    def __init__(self, domain, spec_version, path, started_at=None, submitted_at=None, id=None):
+        self.id = id or uuid.uuid4().hex
+        self.domain = domain
+        self.spec_version = spec_version
+        self.path = list(path)
+        self.started_at = timestamp(started_at)
+        self.submitted_at = timestamp(submitted_at) or utc_now()
+
+    def row(self):
+        return (
+            self.id,
+            self.domain,
+            self.spec_version,
+            self.started_at,
+            self.submitted_at,
+            json.dumps(self.path, default=str),
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        id, domain, spec_version, started_at, submitted_at, path = row
+        return cls(
+            domain,
+            spec_version,
+            [tuple(step) for step in json.loads(path)],
+            started_at=started_at,
+            submitted_at=submitted_at,
+            id=id,
+        )
+
+
+class ReferralStore:
+    """Append-only SQLite store with a batching background writer.
+
+    :meth:`submit` only enqueues.  The writer takes everything waiting (up
+    to ``batch_size`` rows) and commits it in one transaction, retrying a
+    failed commit ``retries`` times with a doubling delay.  Failures are
+    raised through each submission's future and also kept in ``errors``
+    as ``(time, rows, message)``.
+    """
+
+    def __init__(self, path, batch_size=200, retries=3, retry_delay=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.errors = []
+        self.written = 0
+        self.pending = queue.Queue()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.executescript(SCHEMA)
+
+        self.writer = threading.Thread(target=self.run, name="referral-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with NORMAL sync is durable across application crashes; only
+        # an OS crash can lose the last few committed batches
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, referral):
+        """Queue ``referral`` for writing.
+
+        Returns a :class:`~concurrent.futures.Future` whose result is the
+        referral id once committed; it raises :class:`ReferralWriteError`
+        if the row could not be written.
+        """
+        future = Future()
+        self.pending.put((referral, future))
+        return future
+
+    def run(self):
+        with closing(self.connect()) as conn:
+            self.drain(conn)
+
+    def drain(self, conn):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = [r for r in batch if r is not None]
+            if items:
+                self.write_batch(conn, items)
+            for _ in batch:
+                self.pending.task_done()
+            if len(items) < len(batch):
+                return
+
+    def write_batch(self, conn, items):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            if self.commit(conn, items):
+                return
+        if len(items) > 1:
+            # Still failing: row by row, so only the rows at fault fail
+            items = [item for item in items if not self.commit(conn, [item])]
+        for referral, future in items:
+            future.set_exception(ReferralWriteError(self.errors[-1][2]))
+
+    def commit(self, conn, items):
+        """Write ``items`` in one transaction; settle their futures on success."""
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(INSERT, [referral.row() for referral, _ in items])
+        except sqlite3.Error as exc:
+            self.errors.append((utc_now(), len(items), str(exc)))
+            REGISTRY.add("referral_write_errors", 1)
+            return False
+        self.written += len(items)
+        REGISTRY.observe("referral_commit", time.perf_counter() - start)
+        REGISTRY.add("referrals_written", len(items))
+        for referral, future in items:
+            future.set_result(referral.id)
+        return True
+
+    def flush(self):
+        """Block until everything submitted so far has been written."""
+        self.pending.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def count(self, domain=None):
+        with closing(self.connect()) as conn:
+            if domain is None:
+                return conn.execute("SELECT COUNT(*) FROM referrals").fetchone()[0]
+            return conn.execute(
+                "SELECT COUNT(*) FROM referrals WHERE domain = ?", (domain,)
+            ).fetchone()[0]
+
+    def recent(self, limit=20):
+        """The latest ``limit`` referrals, newest first."""
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, domain, spec_version, started_at, submitted_at, path "
+                "FROM referrals ORDER BY seq DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [Referral.from_row(row) for row in rows]
@@ -0,0 +1,115 @@
+# ===============================================
+# Hot reload of the specification workbook
+# ===============================================
+#
+# A SpecWatcher polls the workbook (a stat call per interval; the content
+# hash is only recomputed when size or mtime change).  A new version is
+# compiled and audited on the watcher's own thread and only then swapped
+# in with a single reference assignment, so no session ever waits for a
+# compile.  Sessions that already hold a Spec keep it; only sessions that
+# ask for ``current`` afterwards see the new version.
+#
+# A new version is rejected, and the live one kept, when it fails to load
+# or when its audit finds more errors than the live version's.
+
+import threading
+import time
+
+from .audit import run_audit
+from .shared import load_shared_spec
+from .spec import load_spec, spec_hash
+from .timing import REGISTRY
+
+RELOAD_INTERVAL = 2.0
+
+
+def audit_spec(spec):
+    # Shared specs carry the report made when they were packed; auditing
+    # them here would decode every node into this worker's private memory
+    report = getattr(spec, "audit", None)
+    return report if report is not None else run_audit(spec.rules)
+
+
+class SpecWatcher:
+    """The live :class:`Spec` for ``path``, refreshed in the background.
+
+    ``rejected`` holds ``(version, reason)`` for the last version that was
+    not swapped in, cleared by the next successful reload.  With
+    ``shared`` the rules are mapped from the packed file shared by every
+    worker process (see shared.py).
+    """
+
+    def __init__(self, path, interval=RELOAD_INTERVAL, snapshot_dir=None, start=True, shared=False):
+        self.path = path
+        self.interval = interval
+        self.snapshot_dir = snapshot_dir
+        self.loader = load_shared_spec if shared else load_spec
+        self.rejected = None
+        self.reloads = 0
+
+        spec = self.loader(path, snapshot_dir)
+        # (spec, audit report), replaced as one object so readers never
+        # see a spec paired with another version's report
+        self.live = (spec, audit_spec(spec))
+        self.seen = spec.version
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="spec-watcher", daemon=True)
+        if start:
+            self.thread.start()
+
+    @property
+    def current(self):
+        return self.live[0]
+
+    @property
+    def report(self):
+        return self.live[1]
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def check(self):
+        """Reload if the workbook changed; True when a new version went live."""
+        try:
+            version = spec_hash(self.path)
+        except OSError:
+            # Mid-save or being replaced; try again next interval
+            return False
+        if version == self.seen:
+            return False
+
+        start = time.perf_counter()
+        try:
+            spec = self.loader(self.path, self.snapshot_dir)
+            report = audit_spec(spec)
+        except Exception as exc:  # a half-written or malformed workbook
+            self.seen = version
+            self.reject(version, f"{type(exc).__name__}: {exc}")
+            return False
+        self.seen = spec.version
+
+        live_errors = self.report.errors
+        if report.errors > live_errors:
+            self.reject(
+                spec.version,
+                f"audit found {report.errors} error(s), the live version has {live_errors}",
+            )
+            return False
+
+        self.live = (spec, report)
+        self.rejected = None
+        self.reloads += 1
+        REGISTRY.observe("spec_reload", time.perf_counter() - start)
+        REGISTRY.add("spec_reloads", 1)
+        return True
+
+    def reject(self, version, reason):
+        self.rejected = (version, reason)
+        REGISTRY.add("spec_reloads_rejected", 1)
@@ -0,0 +1,228 @@
+# ===============================================
+# Bulk replay of recorded referrals
+# ===============================================
+#
+#   python -m safeguarding.replay NEW.xlsx --referrals Data/referrals.sqlite3
+#   python -m safeguarding.replay NEW.xlsx --against OLD.xlsx --referrals past.jsonl
+#
+# Pushes each recorded answer set through the compiled rules with the
+# same semantics as the app (DomainForm): answers to questions that are
+# no longer shown are dropped.  With --against, every referral is
+# replayed under both versions and only those whose path differs are
+# reported.  Work is split into chunks across a process pool; each
+# worker loads the specs once from their snapshots.
+#
+# Referral files are either the app's SQLite store or JSON lines with
+# "id", "domain" and either "path" ([[field_ref, answer], ...]) or
+# "answers" ({field_ref: answer}).
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from .answers import DomainForm
+from .spec import load_spec
+
+CHUNK_SIZE = 2000
+
+
+class Replay:
+    """Where one referral ends up under one specification version."""
+
+    __slots__ = ("id", "domain", "path", "unanswered", "missing", "dropped")
+
+    def __init__(self, id, domain, path, unanswered, missing, dropped):
+        self.id = id
+        self.domain = domain
+        self.path = path
+        self.unanswered = unanswered
+        self.missing = missing
+        self.dropped = dropped
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "domain": self.domain,
+            "path": [list(step) for step in self.path],
+            "unanswered": list(self.unanswered),
+            "missing": list(self.missing),
+            "dropped": list(self.dropped),
+        }
+
+
+def replay_one(rules, record):
+    """Replay ``(id, domain, answers)`` against a :class:`RuleGraph`."""
+    id, domain, answers = record
+    if domain not in rules:
+        return Replay(id, domain, (), (), (), tuple(ref for ref, _ in answers))
+
+    dr = rules[domain]
+    form = DomainForm(dr, build=False)
+    dropped = form.load(answers)
+    unanswered, missing = [], []
+    for node in form.order:
+        if node >= dr.n_questions:
+            missing.append(dr.refs[node])
+        elif form.values.get(node) is None:
+            unanswered.append(dr.refs[node])
+    return Replay(
+        id,
+        domain,
+        tuple((ref, str(value)) for ref, value in form.path()),
+        tuple(unanswered),
+        tuple(missing),
+        tuple(dropped),
+    )
+
+
+def diff(old, new):
+    """What changed for one referral between two replays, or ``None``."""
+    if old.path == new.path and old.unanswered == new.unanswered and old.missing == new.missing:
+        return None
+    old_order = [ref for ref, _ in old.path]
+    new_order = [ref for ref, _ in new.path]
+    old_refs = set(old_order)
+    old_unanswered = set(old.unanswered)
+    old_missing = set(old.missing)
+    return {
+        "id": new.id,
+        "domain": new.domain,
+        # Answers that counted before but are no longer shown
+        "dropped": [ref for ref in new.dropped if ref in old_refs],
+        # Questions the caseworker would now be asked and has not answered
+        "unanswered": [ref for ref in new.unanswered if ref not in old_unanswered],
+        "missing": [ref for ref in new.missing if ref not in old_missing],
+        "reordered": old_order != new_order and set(new_order) == old_refs,
+    }
+
+
+# -----------------------------
+# Reading referrals
+# -----------------------------
+def read_referrals(path):
+    """``(id, domain, answers)`` records from a SQLite store or JSON lines."""
+    with open(path, "rb") as fh:
+        is_sqlite = fh.read(16) == b"SQLite format 3\x00"
+    if is_sqlite:
+        return read_store(path)
+    return read_jsonl(path)
+
+
+def read_store(path):
+    uri = f"file:{os.path.abspath(path)}?mode=ro"
+    with closing(sqlite3.connect(uri, uri=True)) as conn:
+        rows = conn.execute("SELECT id, domain, path FROM referrals ORDER BY seq").fetchall()
+    return [(id, domain, [tuple(step) for step in json.loads(p)]) for id, domain, p in rows]
+
+
+def read_jsonl(path):
+    records = []
+    with open(path, encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "path" in item:
+                answers = [tuple(step) for step in item["path"]]
+            else:
+                answers = list(item["answers"].items())
+            records.append((
+                item.get("id") or str(line_no),
+                str(item["domain"]).lower().strip(),
+                answers,
+            ))
+    return records
+
+
+def write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as fh:
+        for id, domain, answers in records:
+            fh.write(json.dumps({"id": id, "domain": domain, "path": answers}, default=str) + "\n")
+
+
+# -----------------------------
+# Parallel driver
+# -----------------------------
+_worker_rules = ()
+
+
+def init_worker(spec_paths):
+    global _worker_rules
+    _worker_rules = tuple(load_spec(path).rules for path in spec_paths)
+
+
+def replay_chunk(records):
+    """Replay a chunk in a worker: results, or diffs when two specs are loaded."""
+    if len(_worker_rules) == 1:
+        rules = _worker_rules[0]
+        return [replay_one(rules, r) for r in records]
+    old_rules, new_rules = _worker_rules
+    changes = []
+    for record in records:
+        change = diff(replay_one(old_rules, record), replay_one(new_rules, record))
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+def run_replay(records, spec_paths, workers=None, chunk_size=CHUNK_SIZE):
+    """Replay ``records`` against one spec (results) or two (diffs, old first).
+
+    ``workers=1`` runs in this process, which is quicker for small batches.
+    """
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        init_worker(spec_paths)
+        return [item for chunk in chunks for item in replay_chunk(chunk)]
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(spec_paths,)) as pool:
+        return [item for result in pool.map(replay_chunk, chunks) for item in result]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded referrals through the rules.")
+    parser.add_argument("workbook", help="specification to replay against")
+    parser.add_argument("--referrals", required=True, help="SQLite store or JSON lines file")
+    parser.add_argument("--against", help="older workbook; report referrals whose path differs")
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    records = read_referrals(args.referrals)
+    spec_paths = (args.against, args.workbook) if args.against else (args.workbook,)
+
+    # Build any missing snapshots once, before the workers race to do it
+    for path in spec_paths:
+        load_spec(path)
+
+    start = time.perf_counter()
+    results = run_replay(records, spec_paths, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for item in results:
+            item = item if isinstance(item, dict) else item.to_dict()
+            out.write(json.dumps(item) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    rate = len(records) / elapsed if elapsed else float("inf")
+    if args.against:
+        summary = f"{len(results)} of {len(records)} referrals change path"
+    else:
+        hits = sum(1 for r in results if r.missing)
+        summary = f"{len(records)} referrals replayed, {hits} reach a missing question"
+    print(f"{summary} ({rate:,.0f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# ===============================================
+# Rule map: precomputed layout for vis-network
+# ===============================================
+#
+# The browser does no layout work at all.  Node positions are computed
+# here once per specification version (a tidy tree over the breadth-first
+# spanning tree, so every question sits one row below its nearest parent)
+# and vis-network only draws them with physics disabled.  Large graphs
+# open with their branches collapsed into cluster nodes of at most
+# MAX_BRANCH questions; double-clicking a cluster expands it in place.
+#
+# Uses the vis-network build bundled under lib/, inlined into the page
+# so the map works without network access.
+
+import json
+import os
+import textwrap
+from collections import deque
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+VIS_JS = os.path.join(LIB_DIR, "vis-9.1.2", "vis-network.min.js")
+
+X_SPACING = 140
+Y_SPACING = 120
+
+# Above these sizes branches start collapsed and edge labels move to tooltips
+CLUSTER_THRESHOLD = 300
+EDGE_LABEL_LIMIT = 400
+MAX_BRANCH = 150
+
+COLOURS = {
+    "top": "#cfe2ff",
+    "question": "#fff8c5",
+    "missing": "#f8d7da",
+    "cluster": "#d1e7dd",
+}
+
+
+def spanning_tree(dr):
+    """Breadth-first levels and tree parents for every node of ``dr``.
+
+    Starts from the top-level questions; anything still unplaced (only
+    reachable through a cycle) starts a tree of its own.
+    """
+    n = len(dr.refs)
+    level = [-1] * n
+    parent = [-1] * n
+    roots = []
+    for start in list(dr.top) + list(range(n)):
+        if level[start] != -1:
+            continue
+        roots.append(start)
+        level[start] = 0
+        queue = deque([start])
+        while queue:
+            v = queue.popleft()
+            for w in dr.children[v]:
+                if level[w] == -1:
+                    level[w] = level[v] + 1
+                    parent[w] = v
+                    queue.append(w)
+    return roots, level, parent
+
+
+def tidy_x(n, roots, parent):
+    """Leaves get consecutive slots in depth-first order; parents centre over children."""
+    kids = [[] for _ in range(n)]
+    for v in range(n):
+        if parent[v] != -1:
+            kids[parent[v]].append(v)
+
+    x = [0.0] * n
+    slot = 0
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            v, done = stack.pop()
+            if done:
+                x[v] = (x[kids[v][0]] + x[kids[v][-1]]) / 2
+            elif not kids[v]:
+                x[v] = slot
+                slot += 1
+            else:
+                stack.append((v, True))
+                stack.extend((c, False) for c in reversed(kids[v]))
+        slot += 1  # gap between root trees
+    return x
+
+
+def branch_heads(n, level, parent):
+    """For each node, the head of the collapsed branch it belongs to, or ``-1``.
+
+    A branch is the largest subtree below the top row with at most
+    ``MAX_BRANCH`` nodes, so expanding any one cluster stays cheap.
+    """
+    by_level = sorted(range(n), key=level.__getitem__)
+    size = [1] * n
+    for v in reversed(by_level):
+        if parent[v] != -1:
+            size[parent[v]] += size[v]
+
+    head = [-1] * n
+    for v in by_level:
+        if parent[v] != -1 and head[parent[v]] != -1:
+            head[v] = head[parent[v]]
+        elif level[v] > 0 and 1 < size[v] <= MAX_BRANCH:
+            head[v] = v
+    return head
+
+
+def wrap(text, width=40):
+    return "\n".join(textwrap.wrap(str(text), width)) or "(no text)"
+
+
+def build_layout(dr):
+    """Nodes, edges and clusters for ``dr`` as JSON-ready dicts."""
+    n = len(dr.refs)
+    roots, level, parent = spanning_tree(dr)
+    x = tidy_x(n, roots, parent)
+    head = branch_heads(n, level, parent)
+    top = set(dr.top)
+
+    nodes = []
+    for v in range(n):
+        ref = dr.refs[v]
+        if v >= dr.n_questions:
+            kind, title = "missing", f"{ref}\n(missing question)"
+        else:
+            kind = "top" if v in top else "question"
+            title = f"{ref}\n{wrap(dr.questions[v].text)}"
+        nodes.append({
+            "id": v,
+            "label": ref,
+            "title": title,
+            "x": x[v] * X_SPACING,
+            "y": level[v] * Y_SPACING,
+            "color": COLOURS[kind],
+            "branch": head[v],
+        })
+
+    # One edge per (source, target); parallel answers share a label
+    answers = {}
+    for v, node_edges in enumerate(dr.edges):
+        for answer, child in node_edges:
+            if child is not None:
+                answers.setdefault((v, child), []).append(answer)
+    show_labels = len(answers) <= EDGE_LABEL_LIMIT
+    edges = []
+    for (v, child), labels in answers.items():
+        text = " / ".join(labels)
+        edge = {"from": v, "to": child, "title": text}
+        if show_labels:
+            edge["label"] = text
+        edges.append(edge)
+
+    clusters = []
+    if n > CLUSTER_THRESHOLD:
+        sizes = {}
+        for v in range(n):
+            if head[v] != -1:
+                sizes[head[v]] = sizes.get(head[v], 0) + 1
+        for h, size in sizes.items():
+            if size > 1:
+                clusters.append({
+                    "branch": h,
+                    "label": f"{dr.refs[h]} (+{size - 1})",
+                    "x": x[h] * X_SPACING,
+                    "y": level[h] * Y_SPACING,
+                })
+
+    return {"nodes": nodes, "edges": edges, "clusters": clusters}
+
+
+VIS_OPTIONS = {
+    "physics": False,
+    "layout": {"improvedLayout": False},
+    "nodes": {"shape": "box", "font": {"size": 12}, "margin": 6},
+    "edges": {
+        "arrows": "to",
+        "smooth": False,
+        "font": {"size": 9, "align": "middle"},
+        "color": {"color": "#999999"},
+    },
+    "interaction": {"hideEdgesOnDrag": True, "hideEdgesOnZoom": True, "tooltipDelay": 150},
+}
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<script>%(vis)s</script>
+<style>html, body { margin: 0; } #map { width: 100%%; height: %(height)dpx; border: 1px solid #ddd; }</style>
+</head><body><div id="map"></div>
+<script>
+var data = %(data)s;
+var network = new vis.Network(
+  document.getElementById("map"),
+  {nodes: new vis.DataSet(data.nodes), edges: new vis.DataSet(data.edges)},
+  %(options)s
+);
+data.clusters.forEach(function (c) {
+  network.cluster({
+    joinCondition: function (node) { return node.branch === c.branch; },
+    clusterNodeProperties: {
+      id: "branch-" + c.branch, label: c.label, x: c.x, y: c.y,
+      shape: "box", borderWidth: 2, color: "%(cluster)s"
+    }
+  });
+});
+network.on("doubleClick", function (params) {
+  if (params.nodes.length && network.isCluster(params.nodes[0])) {
+    network.openCluster(params.nodes[0]);
+  }
+});
+network.fit();
+</script></body></html>
+"""
+
+_vis_js = None
+
+
+def render_html(layout, height=700):
+    """A self-contained HTML page drawing ``layout`` with vis-network."""
+    global _vis_js
+    if _vis_js is None:
+        with open(VIS_JS, encoding="utf-8") as fh:
+            _vis_js = fh.read()
+    return PAGE % {
+        "vis": _vis_js,
+        "height": height,
+        # "</" would end the inline script early if a question contained it
+        "data": json.dumps(layout, separators=(",", ":")).replace("</", "<\\/"),
+        "options": json.dumps(VIS_OPTIONS),
+        "cluster": COLOURS["cluster"],
+    }
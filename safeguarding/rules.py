@@ -0,0 +1,231 @@
+# ===============================================
+# Compiled rule graph
+# ===============================================
+#
+# The specification is compiled once per workbook version into plain
+# tuples and dicts so that the form, the audit and the command-line tools
+# can answer "what comes next?" without touching a DataFrame.  Compilation
+# itself is vectorised: one groupby per sheet, with node ids assigned
+# through pandas indexers rather than per-row Python loops.
+
+import numpy as np
+import pandas as pd
+
+from .matching import compile_answers
+from .widgets import build_widget
+
+END_MARKERS = ("", "nan")
+
+
+def group_by_node(n, nodes, *columns):
+    """Split row-aligned ``columns`` into one tuple per node id.
+
+    With a single column each node gets a tuple of values, otherwise a
+    tuple of row tuples.  Row order is preserved within each node.
+    """
+    order = np.argsort(nodes, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(nodes, minlength=n)))).tolist()
+    values = [np.asarray(c, dtype=object)[order].tolist() for c in columns]
+    rows = values[0] if len(values) == 1 else list(zip(*values))
+    return tuple(tuple(rows[bounds[i]:bounds[i + 1]]) for i in range(n))
+
+
+def split_options_column(column):
+    """Split ``"a; b; c"`` cells into one stripped options tuple per row."""
+    raw = column.to_numpy(dtype=object)
+    present = ~pd.isna(raw)
+    parts = pd.Series(raw[present], index=np.flatnonzero(present)).astype(str)
+    parts = parts.str.split(";").explode().str.strip()
+    parts = parts[parts.notna() & (parts != "")]
+    return group_by_node(len(raw), parts.index.to_numpy(dtype=np.int64), parts)
+
+
+def text_column(column):
+    """Column values as strings, with blanks as ``""``."""
+    return column.astype(object).fillna("").astype(str).tolist()
+
+
+class Question:
+    """One row of the question sheet, resolved once at compile time.
+
+    ``widget`` is the :class:`Widget` descriptor the form draws it with.
+    """
+
+    __slots__ = ("domain", "field_ref", "node", "section", "text", "answer_type", "options", "widget")
+
+    def __init__(self, domain, field_ref, node, section, text, answer_type, options):
+        self.domain = domain
+        self.field_ref = field_ref
+        self.node = node
+        self.section = section
+        self.text = text
+        self.answer_type = answer_type
+        self.options = options
+        self.widget = build_widget(field_ref, text, answer_type, options)
+
+    def __repr__(self):
+        return f"Question({self.domain!r}, {self.field_ref!r})"
+
+
+class DomainRules:
+    """Read-only rule structures for one domain.
+
+    Nodes are numbered ``0..len(refs) - 1``: questions first in sheet
+    order, followed by rule refs that have no question row.  All per-node
+    arrays are indexed by that id.
+    """
+
+    __slots__ = (
+        "name",
+        "refs",
+        "ids",
+        "n_questions",
+        "questions",
+        "edges",
+        "parents",
+        "children",
+        "next_ids",
+        "ranges",
+        "invalid",
+        "top",
+        "missing",
+        "ambiguous",
+    )
+
+    def __init__(self, name, refs, questions, edges, parents, children, next_by_answer):
+        self.name = name
+        self.refs = refs
+        self.ids = dict(zip(refs, range(len(refs))))
+        self.n_questions = n_questions = len(questions)
+        self.questions = questions
+        self.edges = edges
+        self.parents = parents
+        self.children = children
+        # Per node: typed answer -> target ids, plus (Range, target ids)
+        by_node = [[] for _ in refs]
+        ids = self.ids
+        for (ref, answer), targets in next_by_answer.items():
+            by_node[ids[ref]].append((answer, tuple(ids[t] for t in targets)))
+        next_ids, ranges, invalid = [], [], []
+        for node, node_rules in enumerate(by_node):
+            kind = questions[node].widget.kind if node < n_questions else None
+            exact, node_ranges, bad = compile_answers(kind, node_rules)
+            next_ids.append(exact)
+            ranges.append(node_ranges)
+            invalid.extend((refs[node], answer) for answer in bad)
+        self.next_ids = tuple(next_ids)
+        self.ranges = tuple(ranges)
+        self.invalid = tuple(sorted(invalid))
+
+        self.top = tuple(i for i in range(n_questions) if not parents[i])
+        self.missing = tuple(sorted(
+            refs[i] for i in range(n_questions, len(refs)) if parents[i]
+        ))
+        self.ambiguous = tuple(sorted(
+            key for key, targets in next_by_answer.items() if len(targets) > 1
+        ))
+
+    def question(self, field_ref):
+        """The :class:`Question` for ``field_ref``, or ``None`` if it has no row."""
+        node = self.ids.get(field_ref)
+        if node is None or node >= self.n_questions:
+            return None
+        return self.questions[node]
+
+    def next_nodes(self, node, value):
+        """Node ids shown after answering ``node`` with a stored (coerced) ``value``."""
+        found = self.next_ids[node].get(value, ())
+        ranges = self.ranges[node]
+        if ranges and value is not None:
+            for rule, targets in ranges:
+                if value in rule:
+                    found = found + tuple(t for t in targets if t not in found)
+        return found
+
+    def top_refs(self):
+        return tuple(self.refs[i] for i in self.top)
+
+
+class RuleGraph:
+    """All domains of one specification version."""
+
+    __slots__ = ("version", "domains")
+
+    def __init__(self, version, domains):
+        self.version = version
+        self.domains = domains
+
+    def __getitem__(self, domain):
+        return self.domains[domain]
+
+    def __contains__(self, domain):
+        return domain in self.domains
+
+    def __iter__(self):
+        return iter(self.domains)
+
+
+def compile_domain(name, domain_q, domain_a):
+    refs = pd.Index(domain_q["field_ref"])
+    options = split_options_column(domain_q["answer_options"])
+    answer_types = domain_q["answer_type"].astype(object)
+    answer_types = answer_types.where(answer_types.isna(), answer_types.astype(str).str.strip())
+    questions = tuple(
+        Question(name, field_ref, node, section, text, answer_type, options[node])
+        for node, (field_ref, section, text, answer_type) in enumerate(zip(
+            domain_q["field_ref"].tolist(),
+            text_column(domain_q["section"]),
+            text_column(domain_q["questions_text"]),
+            answer_types.where(answer_types.notna(), None).tolist(),
+        ))
+    )
+
+    sources = domain_a["field_ref"].to_numpy(dtype=object)
+    answers = domain_a["answer_value"].astype(str).to_numpy(dtype=object)
+    targets = domain_a["next_field_ref"]
+    targets = targets.where(targets.notna() & ~targets.isin(END_MARKERS)).to_numpy(dtype=object)
+    linked = ~pd.isna(targets)
+
+    # Rule refs without a question row get ids after the questions
+    seen = pd.unique(np.concatenate((sources, targets[linked])))
+    refs = refs.append(pd.Index(seen[~pd.Index(seen).isin(refs)]))
+    n = len(refs)
+
+    src = refs.get_indexer(sources)
+    dst = np.full(len(src), -1, dtype=np.int64)
+    dst[linked] = refs.get_indexer(targets[linked])
+
+    child = np.asarray(dst, dtype=object)
+    child[~linked] = None
+    edges = group_by_node(n, src, answers, child)
+    parents = group_by_node(n, dst[linked], src[linked], answers[linked])
+
+    # Unique successors per node, first occurrence wins
+    pair_keys = pd.unique(src[linked] * n + dst[linked])
+    children = group_by_node(n, pair_keys // n, pair_keys % n)
+
+    next_by_answer = {}
+    ref_list = refs.tolist()
+    for s, answer, d in zip(src[linked].tolist(), answers[linked].tolist(), dst[linked].tolist()):
+        next_by_answer.setdefault((ref_list[s], answer), {})[ref_list[d]] = None
+    next_by_answer = {key: tuple(v) for key, v in next_by_answer.items()}
+
+    return DomainRules(name, tuple(ref_list), questions, edges, parents, children, next_by_answer)
+
+
+def compile_rules(df_q, df_a, version=None):
+    """Compile the question and answer sheets into a :class:`RuleGraph`."""
+    df_q = df_q[df_q["domain"].notna()].drop_duplicates(["domain", "field_ref"])
+    df_a = df_a[df_a["domain"].notna() & df_a["field_ref"].notna()]
+
+    answer_groups = df_a.groupby("domain", sort=False).indices
+    no_answers = np.empty(0, dtype=np.int64)
+
+    domains = {}
+    for name, positions in df_q.groupby("domain", sort=False).indices.items():
+        domains[name] = compile_domain(
+            name,
+            df_q.iloc[positions],
+            df_a.iloc[answer_groups.get(name, no_answers)],
+        )
+    return RuleGraph(version, domains)
@@ -0,0 +1,390 @@
+# ===============================================
+# Shared read-only rules for multi-process serving
+# ===============================================
+#
+#   python -m safeguarding.shared "Data/<workbook>.xlsx"
+#
+# The compiled rule graph is packed once per specification version into a
+# flat file of int32 arrays (CSR edge, parent and child lists) and a UTF-8
+# string table, next to the pickle snapshot.  Every worker process maps
+# that file read-only, so the operating system keeps one copy in the page
+# cache however many workers attach, and a new worker starts without
+# reading Excel or unpickling the graph.
+#
+# SharedDomainRules answers the same questions as DomainRules.  Per-node
+# Python objects (questions, edge tuples, answer dicts) are decoded from
+# the map the first time they are used and then kept, so a worker's
+# private memory follows the part of the graph its sessions touch.  The
+# audit report is worked out when the file is packed and kept in its
+# header, since auditing would decode every node.  The raw sheets, which
+# only the audit tab shows, are in a sidecar pickle that is mapped when
+# the rules are attached and unpickled on first use.  A mapped file stays
+# readable after a newer version replaces it, so sessions pinned to an
+# older version keep working.
+
+import argparse
+import json
+import mmap
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from .audit import AuditReport, run_audit
+from .matching import compile_answers
+from .rules import DomainRules, Question, RuleGraph
+from .spec import (
+    atomic_write,
+    engine_version,
+    load_spec,
+    remove_stale,
+    snapshot_dir_for,
+    spec_hash,
+)
+
+MAGIC = b"SGRULES1"
+RULES_SUFFIX = ".rules.bin"
+SHEETS_SUFFIX = ".sheets.pkl"
+SHARED_ENV = "SAFEGUARDING_SHARED_RULES"
+
+# Per-domain int32 arrays, in file order
+ARRAYS = (
+    "refs",
+    "section", "text", "answer_type",
+    "option_ptr", "option",
+    "edge_ptr", "edge_answer", "edge_child",
+    "parent_ptr", "parent", "parent_answer",
+    "child_ptr", "child",
+)
+
+
+def shared_paths(path, version, snapshot_dir=None):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(
+        snapshot_dir_for(path, snapshot_dir), f"{stem}.{version[:16]}.{engine_version()}"
+    )
+    return base + RULES_SUFFIX, base + SHEETS_SUFFIX
+
+
+# -----------------------------
+# Packing
+# -----------------------------
+def csr(rows):
+    """``(ptr, flat)`` for a sequence of tuples."""
+    ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(r) for r in rows])
+    return ptr, [x for r in rows for x in r]
+
+
+def pack_rules(rules):
+    """``(header, int32 array, string blob, string offsets)`` for a RuleGraph.
+
+    The header includes the rules' audit report.
+    """
+    strings = {}
+
+    def sid(value):
+        if value is None:
+            return -1
+        return strings.setdefault(value, len(strings))
+
+    chunks = []
+    size = 0
+
+    def add(values):
+        nonlocal size
+        values = np.asarray(values, dtype=np.int32)
+        chunks.append(values)
+        size += len(values)
+        return [size - len(values), len(values)]
+
+    domains = []
+    for name in rules:
+        dr = rules[name]
+        questions = dr.questions
+        option_ptr, options = csr([q.options for q in questions])
+        edge_ptr, edges = csr(dr.edges)
+        parent_ptr, parents = csr(dr.parents)
+        child_ptr, children = csr(dr.children)
+        columns = {
+            "refs": [sid(r) for r in dr.refs],
+            "section": [sid(q.section) for q in questions],
+            "text": [sid(q.text) for q in questions],
+            "answer_type": [sid(q.answer_type) for q in questions],
+            "option_ptr": option_ptr,
+            "option": [sid(o) for o in options],
+            "edge_ptr": edge_ptr,
+            "edge_answer": [sid(a) for a, _ in edges],
+            "edge_child": [-1 if c is None else c for _, c in edges],
+            "parent_ptr": parent_ptr,
+            "parent": [p for p, _ in parents],
+            "parent_answer": [sid(a) for _, a in parents],
+            "child_ptr": child_ptr,
+            "child": children,
+        }
+        domains.append({
+            "name": name,
+            "n_refs": len(dr.refs),
+            "n_questions": dr.n_questions,
+            "top": list(dr.top),
+            "missing": list(dr.missing),
+            "ambiguous": [list(i) for i in dr.ambiguous],
+            "invalid": [list(i) for i in dr.invalid],
+            "arrays": {key: add(columns[key]) for key in ARRAYS},
+        })
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    header = {
+        "version": rules.version,
+        "byteorder": sys.byteorder,
+        "ints": size,
+        "strings": len(encoded),
+        "domains": domains,
+        "audit": run_audit(rules).to_dict(),
+    }
+    ints = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+    return header, ints, b"".join(encoded), offsets
+
+
+def write_shared(spec, target, sheets_target):
+    """Atomically write the packed rules of ``spec`` and its sheets sidecar."""
+    header, ints, blob, offsets = pack_rules(spec.rules)
+    head = json.dumps(header).encode("utf-8")
+    head += b" " * (-(len(MAGIC) + 8 + len(head)) % 8)
+
+    atomic_write(
+        sheets_target,
+        lambda fh: pickle.dump((spec.df_q, spec.df_a), fh, protocol=pickle.HIGHEST_PROTOCOL),
+    )
+    # Written last: a worker that finds the rules file also finds the sheets
+    atomic_write(target, lambda fh: fh.write(
+        MAGIC + len(head).to_bytes(8, "little") + head + offsets.tobytes() + ints.tobytes() + blob
+    ))
+
+    folder = os.path.dirname(target)
+    remove_stale(folder, spec.path, os.path.basename(target), RULES_SUFFIX)
+    remove_stale(folder, spec.path, os.path.basename(sheets_target), SHEETS_SUFFIX)
+
+
+# -----------------------------
+# Attaching
+# -----------------------------
+class Lazy:
+    """Read-only sequence whose items are built by ``build(i)`` on first use."""
+
+    __slots__ = ("build", "items")
+
+    def __init__(self, build, n):
+        self.build = build
+        self.items = [None] * n
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self[j] for j in range(*i.indices(len(self.items))))
+        item = self.items[i]
+        if item is None:
+            item = self.items[i] = self.build(i)
+        return item
+
+    def __iter__(self):
+        for i in range(len(self.items)):
+            yield self[i]
+
+
+class StringTable:
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __call__(self, i):
+        if i < 0:
+            return None
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class SharedDomainRules(DomainRules):
+    """:class:`DomainRules` read from a packed, memory-mapped rules file."""
+
+    __slots__ = ("arrays", "strings", "answer_rules", "_ids")
+
+    def __init__(self, meta, ints, strings):
+        self.name = meta["name"]
+        self.n_questions = meta["n_questions"]
+        self.strings = strings
+        self.arrays = {
+            key: ints[start:start + count] for key, (start, count) in meta["arrays"].items()
+        }
+        n = meta["n_refs"]
+        self._ids = None
+
+        refs = self.arrays["refs"]
+        self.refs = Lazy(lambda i: strings(refs[i]), n)
+        self.questions = Lazy(self.build_question, self.n_questions)
+        self.edges = Lazy(self.build_edges, n)
+        self.parents = Lazy(self.build_parents, n)
+        child_ptr, child = self.arrays["child_ptr"], self.arrays["child"]
+        self.children = Lazy(lambda i: tuple(child[child_ptr[i]:child_ptr[i + 1]]), n)
+        self.answer_rules = Lazy(self.build_answer_rules, n)
+        self.next_ids = Lazy(lambda i: self.answer_rules[i][0], n)
+        self.ranges = Lazy(lambda i: self.answer_rules[i][1], n)
+
+        self.top = tuple(meta["top"])
+        self.missing = tuple(meta["missing"])
+        self.ambiguous = tuple(tuple(i) for i in meta["ambiguous"])
+        self.invalid = tuple(tuple(i) for i in meta["invalid"])
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = dict(zip(self.refs, range(len(self.refs))))
+        return self._ids
+
+    def build_question(self, node):
+        a, s = self.arrays, self.strings
+        ptr = a["option_ptr"]
+        return Question(
+            self.name,
+            self.refs[node],
+            node,
+            s(a["section"][node]),
+            s(a["text"][node]),
+            s(a["answer_type"][node]),
+            tuple(s(o) for o in a["option"][ptr[node]:ptr[node + 1]]),
+        )
+
+    def build_edges(self, node):
+        a, s = self.arrays, self.strings
+        lo, hi = a["edge_ptr"][node], a["edge_ptr"][node + 1]
+        return tuple(
+            (s(answer), None if child < 0 else child)
+            for answer, child in zip(a["edge_answer"][lo:hi], a["edge_child"][lo:hi])
+        )
+
+    def build_parents(self, node):
+        a, s = self.arrays, self.strings
+        lo, hi = a["parent_ptr"][node], a["parent_ptr"][node + 1]
+        return tuple(
+            (parent, s(answer))
+            for parent, answer in zip(a["parent"][lo:hi], a["parent_answer"][lo:hi])
+        )
+
+    def build_answer_rules(self, node):
+        # Same grouping as compile_domain's next_by_answer, for one node
+        targets = {}
+        for answer, child in self.edges[node]:
+            if child is not None:
+                targets.setdefault(answer, {})[child] = None
+        kind = self.questions[node].widget.kind if node < self.n_questions else None
+        exact, ranges, _ = compile_answers(kind, [(a, tuple(t)) for a, t in targets.items()])
+        return exact, ranges
+
+
+class SharedSpec:
+    """A :class:`Spec` whose rules are mapped from disk; sheets load on first use.
+
+    ``audit`` is the :class:`AuditReport` stored when the rules were packed.
+    """
+
+    __slots__ = ("path", "version", "rules", "audit", "_sheets", "_sheets_map", "_map")
+
+    def __init__(self, path, version, rules, audit, sheets_map, mapped):
+        self.path = path
+        self.version = version
+        self.rules = rules
+        self.audit = audit
+        self._sheets = None
+        self._sheets_map = sheets_map
+        self._map = mapped
+
+    def sheets(self):
+        if self._sheets is None:
+            self._sheets = pickle.loads(self._sheets_map)
+        return self._sheets
+
+    @property
+    def df_q(self):
+        return self.sheets()[0]
+
+    @property
+    def df_a(self):
+        return self.sheets()[1]
+
+
+def map_file(target):
+    with open(target, "rb") as fh:
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def attach(target, sheets_target, path):
+    """Map ``target`` and its sheets read-only and return their :class:`SharedSpec`."""
+    mapped = map_file(target)
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"not a packed rules file: {target}")
+    length = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], "little")
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(mapped[start:start + length]))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"packed rules were written on a {header['byteorder']}-endian machine")
+
+    view = memoryview(mapped)
+    pos = start + length
+    offsets = view[pos:pos + 8 * (header["strings"] + 1)].cast("q")
+    pos += 8 * (header["strings"] + 1)
+    ints = view[pos:pos + 4 * header["ints"]].cast("i")
+    pos += 4 * header["ints"]
+    strings = StringTable(view[pos:], offsets)
+
+    domains = {
+        meta["name"]: SharedDomainRules(meta, ints, strings) for meta in header["domains"]
+    }
+    rules = RuleGraph(header["version"], domains)
+    audit = AuditReport.from_dict(header["audit"])
+    return SharedSpec(path, header["version"], rules, audit, map_file(sheets_target), mapped)
+
+
+def load_shared_spec(path, snapshot_dir=None):
+    """The :class:`SharedSpec` for ``path``, packing it first if needed."""
+    version = spec_hash(path)
+    target, sheets_target = shared_paths(path, version, snapshot_dir)
+    try:
+        spec = attach(target, sheets_target, path)
+        if spec.version == version:
+            return spec
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # Built from the pickle snapshot when there is one, so only the very
+    # first process after a workbook change parses Excel
+    write_shared(load_spec(path, snapshot_dir), target, sheets_target)
+    return attach(target, sheets_target, path)
+
+
+def shared_enabled():
+    return os.environ.get(SHARED_ENV, "").lower() in ("1", "true", "yes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m safeguarding.shared",
+        description="Pack a specification workbook's rules for shared, read-only serving.",
+    )
+    parser.add_argument("workbook")
+    parser.add_argument("--snapshot-dir", default=None)
+    args = parser.parse_args(argv)
+
+    version = spec_hash(args.workbook)
+    target, sheets_target = shared_paths(args.workbook, version, args.snapshot_dir)
+    write_shared(load_spec(args.workbook, args.snapshot_dir), target, sheets_target)
+    print(target)
+
+
+if __name__ == "__main__":
+    main()
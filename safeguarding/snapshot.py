@@ -0,0 +1,30 @@
+# ===============================================
+# Snapshot compiler
+# ===============================================
+#
+#   python -m safeguarding.snapshot "Data/<workbook>.xlsx"
+#
+# Pre-builds the binary snapshot for a workbook so the first server
+# process after a deployment starts without touching openpyxl.
+
+import argparse
+
+from .spec import compile_spec, snapshot_path, spec_hash, write_snapshot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile a specification workbook into its binary snapshot."
+    )
+    parser.add_argument("workbook")
+    parser.add_argument("--snapshot-dir", default=None)
+    args = parser.parse_args(argv)
+
+    version = spec_hash(args.workbook)
+    target = snapshot_path(args.workbook, version, args.snapshot_dir)
+    write_snapshot(compile_spec(args.workbook, version), target)
+    print(target)
+
+
+if __name__ == "__main__":
+    main()
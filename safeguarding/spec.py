@@ -0,0 +1,176 @@
+# ===============================================
+# Specification workbook loading
+# ===============================================
+#
+# Parsing the workbook with openpyxl dominates cold start, so the parsed
+# sheets and the compiled rule graph are stored as a binary snapshot next
+# to the workbook.  Snapshots are named by the workbook content hash (and
+# the engine code version), so editing the workbook or upgrading the code
+# rebuilds them automatically.
+
+import glob
+import hashlib
+import mmap
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from .rules import compile_rules
+
+QUESTION_SHEET = "Safeguarding_Q"
+ANSWER_SHEET = "Safeguarding_A"
+
+SNAPSHOT_DIR = ".snapshots"
+SNAPSHOT_SUFFIX = ".spec.pkl"
+
+_hash_cache = {}
+_engine_version = None
+
+
+def spec_hash(path):
+    """Content hash identifying one version of the specification workbook.
+
+    The hash is memoised on (size, mtime) so repeated calls cost one stat.
+    """
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _hash_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    _hash_cache[path] = (stamp, digest.hexdigest())
+    return _hash_cache[path][1]
+
+
+def engine_version():
+    """Hash of the package sources; part of every snapshot name."""
+    global _engine_version
+    if _engine_version is None:
+        digest = hashlib.sha256()
+        for src in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+            with open(src, "rb") as fh:
+                digest.update(fh.read())
+        _engine_version = digest.hexdigest()[:12]
+    return _engine_version
+
+
+def read_spec(path):
+    """Read the question and answer sheets with normalised domains and types."""
+    df_q = pd.read_excel(path, sheet_name=QUESTION_SHEET)
+    df_a = pd.read_excel(path, sheet_name=ANSWER_SHEET)
+    return normalise_sheets(df_q, df_a)
+
+
+def normalise_sheets(df_q, df_a):
+    df_q["domain"] = df_q["domain"].str.lower().str.strip()
+    df_a["domain"] = df_a["domain"].str.lower().str.strip()
+
+    # Ensure consistent types
+    df_a["answer_value"] = df_a["answer_value"].astype(str)
+    df_a["next_field_ref"] = df_a["next_field_ref"].astype(str, errors="ignore")
+    df_q["field_ref"] = df_q["field_ref"].astype(str)
+
+    return df_q, df_a
+
+
+class Spec:
+    """One version of the specification: raw sheets plus compiled rules."""
+
+    __slots__ = ("path", "version", "df_q", "df_a", "rules")
+
+    def __init__(self, path, version, df_q, df_a, rules):
+        self.path = path
+        self.version = version
+        self.df_q = df_q
+        self.df_a = df_a
+        self.rules = rules
+
+
+def compile_spec(path, version=None):
+    """Parse and compile the workbook, bypassing any snapshot."""
+    if version is None:
+        version = spec_hash(path)
+    df_q, df_a = read_spec(path)
+    return Spec(path, version, df_q, df_a, compile_rules(df_q, df_a, version))
+
+
+# -----------------------------
+# Snapshots
+# -----------------------------
+def snapshot_dir_for(path, snapshot_dir=None):
+    return snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(path)), SNAPSHOT_DIR)
+
+
+def snapshot_path(path, version, snapshot_dir=None):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = f"{stem}.{version[:16]}.{engine_version()}{SNAPSHOT_SUFFIX}"
+    return os.path.join(snapshot_dir_for(path, snapshot_dir), name)
+
+
+def atomic_write(target, write):
+    """Call ``write(fh)`` on a temporary file, then move it over ``target``."""
+    folder = os.path.dirname(target)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def remove_stale(folder, path, keep, suffix):
+    """Delete other versions' ``suffix`` files for workbook ``path``, except ``keep``."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for name in os.listdir(folder):
+        if name == keep or not name.endswith(suffix):
+            continue
+        middle = name[:-len(suffix)]
+        if middle.startswith(stem + ".") and middle[len(stem) + 1:].count(".") == 1:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def write_snapshot(spec, target):
+    """Atomically write ``spec`` to ``target`` and drop stale siblings."""
+    atomic_write(target, lambda fh: pickle.dump(spec, fh, protocol=pickle.HIGHEST_PROTOCOL))
+    remove_stale(os.path.dirname(target), spec.path, os.path.basename(target), SNAPSHOT_SUFFIX)
+
+
+def read_snapshot(target):
+    """Load a snapshot through a read-only memory map."""
+    with open(target, "rb") as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return pickle.load(mm)
+
+
+def load_spec(path, snapshot_dir=None):
+    """Return the :class:`Spec` for ``path``, using or refreshing its snapshot."""
+    version = spec_hash(path)
+    target = snapshot_path(path, version, snapshot_dir)
+    try:
+        spec = read_snapshot(target)
+        if spec.version == version:
+            spec.path = path
+            return spec
+    except (OSError, ValueError, EOFError, AttributeError, pickle.UnpicklingError):
+        pass
+
+    spec = compile_spec(path, version)
+    try:
+        write_snapshot(spec, target)
+    except OSError:
+        # A read-only deployment still works, it just parses every cold start
+        pass
+    return spec
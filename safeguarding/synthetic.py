@@ -0,0 +1,264 @@
+# ===============================================
+# Synthetic specification generator
+# ===============================================
+#
+#   python -m safeguarding.synthetic out.xlsx --questions 2000 --branching 4
+#
+# Produces workbooks shaped like the real specification (same sheets and
+# columns, tree-like referral paths with shared sub-paths) so load time,
+# compilation, rendering and the audit can be measured at any scale.
+# Faults such as missing targets and cycles can be injected on purpose.
+
+import argparse
+import random
+from collections import deque
+
+import pandas as pd
+
+from .answers import DomainForm
+from .spec import ANSWER_SHEET, QUESTION_SHEET
+
+DEFAULT_DOMAINS = ("safeguarding", "police", "fire")
+
+# Relative weights, roughly matching the real specification
+DEFAULT_ANSWER_TYPES = {
+    "radio": 40,
+    "select": 15,
+    "free_text": 35,
+    "numeric": 6,
+    "date": 4,
+}
+
+CHOICE_TYPES = ("radio", "select")
+
+QUESTION_COLUMNS = [
+    "domain", "section", "field_ref", "questions_text",
+    "answer_type", "answer_options", "is_terminal",
+]
+ANSWER_COLUMNS = [
+    "domain", "field_ref", "answer_value", "next_field_ref", "rule_type", "show_group",
+]
+
+
+def generate_domain(
+    domain,
+    rng,
+    questions,
+    branching,
+    depth,
+    roots,
+    answer_types,
+    share,
+    missing_targets,
+    cycles,
+):
+    prefix = domain[:2].upper()
+    types, weights = zip(*answer_types.items())
+    q_rows = []
+    a_rows = []
+    by_depth = {}
+    parent_of = {}
+    text_refs = []
+
+    def new_question(level):
+        ref = f"{prefix}{len(q_rows):05d}"
+        answer_type = rng.choices(types, weights)[0]
+        options = ""
+        if answer_type in CHOICE_TYPES:
+            options = "; ".join(f"Option {k + 1}" for k in range(branching))
+        q_rows.append({
+            "domain": domain.capitalize(),
+            "section": f"[Section {level + 1}]",
+            "field_ref": ref,
+            "questions_text": f"Synthetic question {ref} at depth {level}?",
+            "answer_type": answer_type,
+            "answer_options": options or float("nan"),
+            "is_terminal": 0.0,
+        })
+        by_depth.setdefault(level, []).append(ref)
+        if answer_type == "free_text":
+            text_refs.append(ref)
+        return ref, answer_type, options
+
+    def next_ref(source, level):
+        # Reuse an existing deeper question to model shared sub-paths
+        deeper = by_depth.get(level + 1)
+        if deeper and rng.random() < share:
+            return rng.choice(deeper)
+        if level + 1 >= depth or len(q_rows) >= questions:
+            return float("nan")
+        ref, answer_type, options = new_question(level + 1)
+        parent_of[ref] = source
+        queue.append((ref, answer_type, options, level + 1))
+        return ref
+
+    queue = deque(new_question(0) + (0,) for _ in range(min(roots, questions)))
+    while queue:
+        ref, answer_type, options, level = queue.popleft()
+        if answer_type in CHOICE_TYPES:
+            answers = [o.strip() for o in options.split(";")]
+        else:
+            answers = ["(free text)"]
+        for answer in answers:
+            a_rows.append({
+                "domain": domain.capitalize(),
+                "field_ref": ref,
+                "answer_value": answer,
+                "next_field_ref": next_ref(ref, level),
+                "rule_type": float("nan"),
+                "show_group": float("nan"),
+            })
+
+    # Faults hang off free-text questions, where any answer is valid, so
+    # each one trips exactly one audit check
+    for i in range(missing_targets if text_refs else 0):
+        a_rows.append({
+            "domain": domain.capitalize(),
+            "field_ref": rng.choice(text_refs),
+            "answer_value": "Missing",
+            "next_field_ref": f"{prefix}MISSING{i:03d}",
+            "rule_type": float("nan"),
+            "show_group": float("nan"),
+        })
+    # Loops never point at a root, which would stop it being top-level
+    deep = [r for r in text_refs if parent_of.get(r) in parent_of]
+    for _ in range(cycles if deep else 0):
+        source = rng.choice(deep)
+        ancestor = parent_of[source]
+        while parent_of.get(ancestor) in parent_of and rng.random() < 0.5:
+            ancestor = parent_of[ancestor]
+        a_rows.append({
+            "domain": domain.capitalize(),
+            "field_ref": source,
+            "answer_value": "Loop",
+            "next_field_ref": ancestor,
+            "rule_type": float("nan"),
+            "show_group": float("nan"),
+        })
+
+    return q_rows, a_rows
+
+
+def generate_sheets(
+    domains=DEFAULT_DOMAINS,
+    questions=200,
+    branching=3,
+    depth=8,
+    roots=5,
+    answer_types=None,
+    share=0.2,
+    missing_targets=0,
+    cycles=0,
+    seed=0,
+):
+    """Return raw ``(questions, answers)`` sheets as they appear in the workbook.
+
+    ``questions`` is the number of questions per domain.  Each choice
+    question has ``branching`` options; ``share`` is the chance that an
+    answer reuses an existing question one level deeper instead of
+    creating a new one.
+    """
+    rng = random.Random(seed)
+    q_rows, a_rows = [], []
+    for domain in domains:
+        q, a = generate_domain(
+            domain,
+            rng,
+            questions,
+            branching,
+            depth,
+            roots,
+            answer_types or DEFAULT_ANSWER_TYPES,
+            share,
+            missing_targets,
+            cycles,
+        )
+        q_rows.extend(q)
+        a_rows.extend(a)
+    return (
+        pd.DataFrame(q_rows, columns=QUESTION_COLUMNS),
+        pd.DataFrame(a_rows, columns=ANSWER_COLUMNS),
+    )
+
+
+def synthetic_answer(rng, question):
+    if question.options:
+        return rng.choice(question.options)
+    if question.widget.kind in CHOICE_TYPES:
+        # A choice without options cannot be answered in the form
+        return None
+    if question.answer_type == "numeric":
+        return float(rng.randint(0, 100))
+    if question.answer_type == "date":
+        return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return "(free text)"
+
+
+def generate_referrals(rules, count, seed=0, skip=0.1):
+    """``(id, domain, answers)`` records made by answering forms at random.
+
+    Questions are answered in the order the app shows them; ``skip`` is
+    the chance of leaving a visible question blank.
+    """
+    rng = random.Random(seed)
+    domains = list(rules)
+    records = []
+    for i in range(count):
+        domain = rng.choice(domains)
+        dr = rules[domain]
+        form = DomainForm(dr)
+        skipped = set()
+        while True:
+            todo = [
+                node for node in form.order
+                if node < dr.n_questions and node not in form.values and node not in skipped
+            ]
+            if not todo:
+                break
+            node = todo[0]
+            if rng.random() < skip:
+                skipped.add(node)
+            else:
+                question = dr.questions[node]
+                form.answer(node, question.widget.coerce(synthetic_answer(rng, question)))
+        records.append((f"synthetic-{i:07d}", domain, form.path()))
+    return records
+
+
+def write_workbook(path, df_q, df_a):
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        df_q.to_excel(writer, sheet_name=QUESTION_SHEET, index=False)
+        df_a.to_excel(writer, sheet_name=ANSWER_SHEET, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic specification workbook.")
+    parser.add_argument("output")
+    parser.add_argument("--domains", nargs="+", default=list(DEFAULT_DOMAINS))
+    parser.add_argument("--questions", type=int, default=200, help="questions per domain")
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--roots", type=int, default=5)
+    parser.add_argument("--share", type=float, default=0.2)
+    parser.add_argument("--missing-targets", type=int, default=0)
+    parser.add_argument("--cycles", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df_q, df_a = generate_sheets(
+        domains=args.domains,
+        questions=args.questions,
+        branching=args.branching,
+        depth=args.depth,
+        roots=args.roots,
+        share=args.share,
+        missing_targets=args.missing_targets,
+        cycles=args.cycles,
+        seed=args.seed,
+    )
+    write_workbook(args.output, df_q, df_a)
+    print(f"{args.output}: {len(df_q)} questions, {len(df_a)} rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# ===============================================
+# Hot-path timing instrumentation
+# ===============================================
+#
+# A RunTimings collects named timers and counters for one script run or
+# one fragment rerun.  Fragment reruns do not execute the rest of the
+# script, so each fragment creates its own.  Every observation also feeds
+# a process-wide REGISTRY so latency can be attributed under real load.
+# Optional exports, both to local files:
+#
+#   SAFEGUARDING_METRICS_FILE  Prometheus text format (node_exporter
+#                              textfile collector), rewritten on flush
+#   SAFEGUARDING_TRACE_FILE    one JSON span per line, using OpenTelemetry
+#                              span field names, appended on flush
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE_ENV = "SAFEGUARDING_METRICS_FILE"
+TRACE_FILE_ENV = "SAFEGUARDING_TRACE_FILE"
+
+METRIC_PREFIX = "safeguarding"
+
+
+class Registry:
+    """Cumulative stage timings and counters for this server process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_seconds = {}
+        self.stage_count = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_count[name] = self.stage_count.get(name, 0) + 1
+
+    def add(self, name, n):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def prometheus_text(self):
+        with self.lock:
+            seconds = dict(self.stage_seconds)
+            count = dict(self.stage_count)
+            counters = dict(self.counters)
+
+        stage = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {stage} Wall time spent in each app stage.",
+            f"# TYPE {stage} summary",
+        ]
+        for name in sorted(seconds):
+            lines.append(f'{stage}_sum{{stage="{name}"}} {seconds[name]:.6f}')
+            lines.append(f'{stage}_count{{stage="{name}"}} {count[name]}')
+        for name in sorted(counters):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class RunTimings:
+    """Timers and counters for a single rerun."""
+
+    def __init__(self, scope="app", registry=REGISTRY):
+        self.scope = scope
+        self.registry = registry
+        self.timers = {}
+        self.counters = {}
+        self.spans = []
+        self.trace_id = os.urandom(16).hex()
+
+    @contextmanager
+    def timer(self, name):
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timers[name] = self.timers.get(name, 0.0) + elapsed
+            self.registry.observe(name, elapsed)
+            self.spans.append((name, start_ns, start_ns + int(elapsed * 1e9)))
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        self.registry.add(name, n)
+
+    def rows(self):
+        """``(name, milliseconds)`` for timers then ``(name, count)`` for counters."""
+        timers = [(name, round(seconds * 1000, 2)) for name, seconds in self.timers.items()]
+        return timers, list(self.counters.items())
+
+    def flush(self):
+        """Write any configured exports; a no-op when none are set."""
+        metrics_file = os.environ.get(METRICS_FILE_ENV)
+        trace_file = os.environ.get(TRACE_FILE_ENV)
+        if metrics_file:
+            write_atomic(metrics_file, self.registry.prometheus_text())
+        if trace_file and self.spans:
+            append_spans(trace_file, self)
+        self.spans = []
+
+
+def write_atomic(path, text):
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+
+_trace_lock = threading.Lock()
+
+
+def append_spans(path, run):
+    lines = []
+    for name, start_ns, end_ns in run.spans:
+        lines.append(json.dumps({
+            "trace_id": run.trace_id,
+            "span_id": os.urandom(8).hex(),
+            "name": name,
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": end_ns,
+            "attributes": {"scope": run.scope, **run.counters},
+        }))
+    with _trace_lock, open(path, "a", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
@@ -0,0 +1,123 @@
+# ===============================================
+# Headless rule validator
+# ===============================================
+#
+#   python -m safeguarding.validate "Data/<workbook>.xlsx" --format junit
+#
+# Runs the same audit as the Rule Audit tab without Streamlit so spec
+# changes can be gated before deployment.  Exits 1 when the audit finds
+# errors (missing targets, ambiguous rules, cycles, unknown rule answers,
+# rule answers that cannot match a numeric or date question), 0 otherwise;
+# warnings are reported but do not fail the run.
+
+import argparse
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from .audit import CHECKS, run_audit
+from .spec import compile_spec, load_spec
+
+FORMATS = ("text", "json", "junit")
+
+
+def format_item(attr, item):
+    if attr == "cycles":
+        return " -> ".join(item + item[:1])
+    return " = ".join(item) if isinstance(item, tuple) else str(item)
+
+
+def render_text(report, elapsed):
+    lines = []
+    for result in report:
+        lines.append(f"[{result.domain}]")
+        for attr, _, severity in CHECKS:
+            items = getattr(result, attr)
+            if severity == "info":
+                lines.append(f"  {attr}: {len(items)}")
+                continue
+            status = ("FAIL" if severity == "error" else "WARN") if items else "ok"
+            lines.append(f"  {attr}: {status} ({len(items)})")
+            lines.extend(f"    - {format_item(attr, i)}" for i in items)
+    lines.append(
+        f"{report.errors} error(s), {report.warnings} warning(s) in {elapsed * 1000:.1f} ms"
+    )
+    return "\n".join(lines)
+
+
+def render_json(report, elapsed):
+    data = report.to_dict()
+    data["elapsed_ms"] = round(elapsed * 1000, 3)
+    return json.dumps(data, indent=2)
+
+
+def render_junit(report, elapsed):
+    suites = ET.Element("testsuites", name="safeguarding.validate", time=f"{elapsed:.6f}")
+    for result in report:
+        checks = [c for c in CHECKS if c[2] != "info"]
+        failures = sum(
+            1 for attr, _, severity in checks if severity == "error" and getattr(result, attr)
+        )
+        suite = ET.SubElement(
+            suites,
+            "testsuite",
+            name=result.domain,
+            tests=str(len(checks)),
+            failures=str(failures),
+            errors="0",
+        )
+        for attr, label, severity in checks:
+            case = ET.SubElement(suite, "testcase", classname=result.domain, name=attr)
+            items = getattr(result, attr)
+            if not items:
+                continue
+            detail = "\n".join(format_item(attr, i) for i in items)
+            if severity == "error":
+                failure = ET.SubElement(case, "failure", message=f"{len(items)} x {label}")
+                failure.text = detail
+            else:
+                ET.SubElement(case, "system-out").text = f"{len(items)} x {label}\n{detail}"
+    ET.indent(suites)
+    return ET.tostring(suites, encoding="unicode", xml_declaration=True)
+
+
+RENDERERS = {
+    "text": render_text,
+    "json": render_json,
+    "junit": render_junit,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m safeguarding.validate",
+        description="Validate the rules in a safeguarding specification workbook.",
+    )
+    parser.add_argument("workbook")
+    parser.add_argument("--format", choices=FORMATS, default="text")
+    parser.add_argument("--output", "-o", help="write the report here instead of stdout")
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="always parse the workbook instead of using its binary snapshot",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    spec = compile_spec(args.workbook) if args.no_snapshot else load_spec(args.workbook)
+    report = run_audit(spec.rules)
+    elapsed = time.perf_counter() - start
+
+    output = RENDERERS[args.format](report, elapsed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# ===============================================
+# Widget descriptors
+# ===============================================
+#
+# Everything the form needs to draw a question, worked out once at
+# compile time: the widget kind, its label, the option tuple, the
+# default and the function that turns a widget value into the stored
+# answer.  The renderer then does one dict lookup per question instead
+# of rebuilding labels and option lists and comparing type strings.
+#
+# The coercers also define the stored form of an answer, which is the
+# form rule answers are compiled to (see matching.py).
+
+from datetime import date, datetime
+
+# Widget kinds, as written in the answer_type column
+RADIO, SELECT, FREE_TEXT, NUMERIC, DATE = "radio", "select", "free_text", "numeric", "date"
+WIDGET_KINDS = (RADIO, SELECT, FREE_TEXT, NUMERIC, DATE)
+CHOICE_KINDS = (RADIO, SELECT)
+
+
+def as_text(value):
+    return None if value is None else str(value)
+
+
+def as_number(value):
+    """``value`` as a float; numbers typed into the sheet arrive as text."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def as_date(value):
+    """``value`` as a date; ISO strings come from the sheet and saved referrals."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value.strip())
+        except ValueError:
+            try:
+                return datetime.fromisoformat(value.strip()).date()
+            except ValueError:
+                return None
+    return None
+
+
+COERCERS = {
+    RADIO: as_text,
+    SELECT: as_text,
+    FREE_TEXT: as_text,
+    NUMERIC: as_number,
+    DATE: as_date,
+}
+
+
+class Widget:
+    """How to draw one question; ``kind`` is ``None`` for unknown answer types."""
+
+    __slots__ = ("kind", "label", "options", "default", "coerce")
+
+    def __init__(self, kind, label, options, default=None):
+        self.kind = kind
+        self.label = label
+        self.options = options
+        self.default = default
+        self.coerce = COERCERS.get(kind, as_text)
+
+    def __repr__(self):
+        return f"Widget({self.kind!r}, {self.label!r})"
+
+
+def build_widget(field_ref, text, answer_type, options):
+    kind = answer_type if answer_type in WIDGET_KINDS else None
+    return Widget(kind, f"{field_ref} – {text}", options if kind in CHOICE_KINDS else ())
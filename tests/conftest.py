@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from safeguarding.rules import compile_rules  # noqa: E402
+from safeguarding.spec import normalise_sheets  # noqa: E402
+from safeguarding.synthetic import ANSWER_COLUMNS, QUESTION_COLUMNS, write_workbook  # noqa: E402
+
+
+def sheets(questions, answers, domain="test"):
+    """Raw sheets from ``(ref, answer_type, options)`` and
+    ``(ref, answer, next_ref)`` rows."""
+    df_q = pd.DataFrame(
+        [(domain, "", ref, f"Question {ref}", kind, options, "") for ref, kind, options in questions],
+        columns=QUESTION_COLUMNS,
+    )
+    df_a = pd.DataFrame(
+        [(domain, ref, answer, target, "", "") for ref, answer, target in answers],
+        columns=ANSWER_COLUMNS,
+    )
+    return df_q, df_a
+
+
+def make_rules(questions, answers, domain="test"):
+    """A compiled :class:`DomainRules` for a small domain."""
+    df_q, df_a = sheets(questions, answers, domain)
+    return compile_rules(*normalise_sheets(df_q, df_a), version="test")[domain]
+
+
+def write_sheets(path, questions, answers, domain="test"):
+    """Write a small domain as a workbook and return its path."""
+    write_workbook(str(path), *sheets(questions, answers, domain))
+    return str(path)
+
+
+def yes_no(*refs):
+    return [(ref, "radio", "Yes; No") for ref in refs]
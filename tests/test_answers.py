@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from conftest import make_rules, yes_no
+from safeguarding.answers import DomainForm
+from safeguarding.synthetic import generate_sheets, synthetic_answer
+from safeguarding.rules import compile_rules
+from safeguarding.spec import normalise_sheets
+
+
+def refs(form):
+    return [form.rules.refs[node] for node in form.order]
+
+
+def answer(form, ref, value):
+    return {form.rules.refs[n] for n in form.answer(form.rules.ids[ref], value)}
+
+
+def rebuilt(form):
+    """A fresh form with the same answers, walked from scratch."""
+    fresh = DomainForm(form.rules, build=False)
+    fresh.values = dict(form.values)
+    fresh.rebuild()
+    return fresh
+
+
+def test_shared_question_keeps_answer_under_other_parent():
+    # A and B both lead to X; X leads to Y
+    rules = make_rules(
+        yes_no("A", "B", "X", "Y"),
+        [("A", "Yes", "X"), ("A", "No", "B"), ("B", "Yes", "X"), ("X", "Yes", "Y")],
+    )
+    form = DomainForm(rules)
+    assert refs(form) == ["A"]
+    answer(form, "A", "No")
+    answer(form, "B", "Yes")
+    answer(form, "X", "Yes")
+    assert refs(form) == ["A", "B", "X", "Y"]
+
+    # X is still shown under B, so its answer stays
+    assert answer(form, "A", None) == {"B", "X"}
+    assert refs(form) == ["A"]
+
+
+def test_answer_only_clears_questions_that_disappear():
+    rules = make_rules(
+        yes_no("T", "A", "B", "X", "Y"),
+        [
+            ("T", "Yes", "A"), ("T", "Yes", "B"),
+            ("A", "Yes", "X"), ("B", "Yes", "X"), ("X", "Yes", "Y"),
+        ],
+    )
+    form = DomainForm(rules)
+    answer(form, "T", "Yes")
+    answer(form, "B", "Yes")
+    answer(form, "X", "Yes")
+    assert refs(form) == ["T", "A", "B", "X", "Y"]
+
+    # A=No never showed X, and X is still shown under B
+    assert answer(form, "A", "No") == set()
+    assert form.get(rules.ids["X"]) == "Yes"
+    assert refs(form) == refs(rebuilt(form)) == ["T", "A", "B", "X", "Y"]
+
+    # Hiding B takes X and Y with it
+    assert answer(form, "B", "No") == {"X"}
+    assert refs(form) == ["T", "A", "B"]
+
+
+def test_cycle_never_clears_an_ancestor():
+    rules = make_rules(
+        yes_no("A", "B", "C"),
+        [("A", "Yes", "B"), ("B", "Yes", "C"), ("C", "Yes", "B")],
+    )
+    form = DomainForm(rules)
+    answer(form, "A", "Yes")
+    answer(form, "B", "Yes")
+    assert answer(form, "C", "Yes") == set()
+    assert form.get(rules.ids["B"]) == "Yes"
+    assert refs(form) == ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_clicks_match_full_rebuild(seed):
+    df_q, df_a = generate_sheets(
+        domains=("test",), questions=300, share=0.3, missing_targets=5, cycles=10, seed=seed
+    )
+    rules = compile_rules(*normalise_sheets(df_q, df_a))["test"]
+    rng = random.Random(seed)
+    form = DomainForm(rules)
+    followed = {"Loop": 0, "Missing": 0}
+    for _ in range(2000):
+        shown = [n for n in form.order if n < rules.n_questions]
+        node = rng.choice(shown)
+        question = rules.questions[node]
+        faults = [a for a, _ in rules.edges[node] if a in followed]
+        if faults and rng.random() < 0.5:
+            # Take the injected Loop or Missing branch
+            value = rng.choice(faults)
+        elif rng.random() < 0.05:
+            value = None
+        else:
+            value = question.widget.coerce(synthetic_answer(rng, question))
+        if value in followed and form.get(node) != value:
+            followed[value] += 1
+        form.answer(node, value)
+
+        fresh = rebuilt(form)
+        assert form.order == fresh.order
+        assert form.depth == fresh.depth
+        assert form.visible == fresh.visible
+        # Every kept answer is on screen
+        assert form.visible.issuperset(form.values)
+
+    assert followed["Loop"] and followed["Missing"]
@@ -0,0 +1,93 @@
+import pytest
+
+from conftest import write_sheets
+from safeguarding.api import LocalClient, create_app
+
+QUESTIONS = [
+    ("AGE", "numeric", None),
+    ("ADULT", "radio", "Yes; No"),
+    ("SEEN", "date", None),
+    ("NOTES", "free_text", None),
+]
+RULES = [
+    ("AGE", ">=18", "ADULT"),
+    ("ADULT", "Yes", "SEEN"),
+    ("SEEN", "<2025-01-01", "NOTES"),
+]
+
+
+@pytest.fixture
+def client(tmp_path):
+    workbook = write_sheets(tmp_path / "spec.xlsx", QUESTIONS, RULES)
+    app = create_app(workbook, shared=False, snapshot_dir=str(tmp_path / "snapshots"))
+    client = LocalClient(app)
+    yield client
+    client.close()
+    app.state.watcher.stop()
+
+
+def evaluate(client, answers):
+    return client.post("/domains/test/evaluate", {"answers": answers})
+
+
+def test_health_and_domains(client):
+    status, body = client.get("/health")
+    assert status == 200 and body["status"] == "ok"
+    status, body = client.get("/domains")
+    assert body["domains"] == [{"domain": "test", "questions": 4, "top": ["AGE"]}]
+
+
+def test_evaluate_follows_the_form(client):
+    status, body = evaluate(client, {"AGE": "42", "ADULT": "Yes", "SEEN": "2024-06-01"})
+    assert status == 200
+    assert body["path"] == [["AGE", "42.0"], ["ADULT", "Yes"], ["SEEN", "2024-06-01"]]
+    assert [q["field_ref"] for q in body["next"]] == ["NOTES"]
+    assert not body["complete"]
+
+    # Answers below a question that is no longer shown are dropped
+    status, body = evaluate(client, [["AGE", 12], ["ADULT", "Yes"], ["UNKNOWN", "x"]])
+    assert body["path"] == [["AGE", "12.0"]]
+    assert body["complete"]
+    assert sorted(body["dropped"]) == ["ADULT", "UNKNOWN"]
+
+
+@pytest.mark.parametrize("answers", [
+    {"ADULT": "Bogus"},
+    {"ADULT": ""},
+    {"AGE": "old"},
+    {"SEEN": "yesterday"},
+    {"NOTES": ["a", "list"]},
+])
+def test_answers_the_form_cannot_give_are_rejected(client, answers):
+    status, body = evaluate(client, {"AGE": 30, **answers})
+    assert status == 400
+    assert body["invalid"] == [list(pair) for pair in answers.items()]
+
+
+def test_batch(client):
+    status, body = client.post("/evaluate", {"referrals": [
+        {"id": "a", "domain": "test", "answers": {"AGE": 20}},
+        {"id": "b", "domain": "test", "answers": {}},
+    ]})
+    assert status == 200
+    assert [r["id"] for r in body["results"]] == ["a", "b"]
+
+    status, body = client.post("/evaluate", {"referrals": [
+        {"domain": "test", "answers": {}},
+        {"domain": "test", "answers": {"ADULT": "Maybe"}},
+    ]})
+    assert status == 400 and body["error"].startswith("referral 1:")
+
+
+@pytest.mark.parametrize("item", [{"domain": ["test"]}, {"domain": {"a": 1}}, {"domain": "nope"}, "test"])
+def test_batch_rejects_bad_domains(client, item):
+    status, body = client.post("/evaluate", {"referrals": [item]})
+    assert status == 400
+    assert "domain" in body["error"]
+
+
+def test_errors_are_json(client):
+    assert client.get("/nowhere")[0] == 404
+    assert client.post("/domains/nope/evaluate", {})[0] == 404
+    assert client.get("/domains/test/questions/NOPE") == (404, {"error": "unknown question: NOPE"})
+    assert client.post("/domains/test/evaluate", {"answers": "AGE=1"})[0] == 400
@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from safeguarding.matching import ANY, Range, compile_answers, parse_answer
+from safeguarding.widgets import DATE, FREE_TEXT, NUMERIC, RADIO
+
+
+def matches(key, value):
+    return value in key if isinstance(key, Range) else value == key
+
+
+@pytest.mark.parametrize("answer, inside, outside", [
+    ("<18", [17.9, -1.0], [18.0, 30.0]),
+    ("<=18", [18.0, 0.0], [18.5]),
+    (">65", [65.5], [65.0, 10.0]),
+    (">= 65", [65.0, 90.0], [64.9]),
+    ("18..64", [18.0, 40.0, 64.0], [17.9, 64.1]),
+])
+def test_numeric_ranges(answer, inside, outside):
+    key = parse_answer(NUMERIC, answer)
+    assert isinstance(key, Range)
+    assert all(matches(key, v) for v in inside)
+    assert not any(matches(key, v) for v in outside)
+
+
+def test_date_range_is_inclusive():
+    key = parse_answer(DATE, "2020-01-01..2024-12-31")
+    assert date(2020, 1, 1) in key
+    assert date(2024, 12, 31) in key
+    assert date(2025, 1, 1) not in key
+    assert parse_answer(DATE, "<2020-01-01").high == date(2020, 1, 1)
+
+
+def test_exact_values_are_typed():
+    assert parse_answer(NUMERIC, "5") == 5.0
+    assert parse_answer(NUMERIC, " 2.5 ") == 2.5
+    assert parse_answer(DATE, "2025-03-04") == date(2025, 3, 4)
+    assert parse_answer(DATE, "2025-03-04 00:00:00") == date(2025, 3, 4)
+
+
+@pytest.mark.parametrize("kind", [FREE_TEXT, NUMERIC, DATE])
+@pytest.mark.parametrize("answer", ["any", "*", "(free text)", "Free Text", "numeric"])
+def test_placeholders_match_anything(kind, answer):
+    assert parse_answer(kind, answer) is ANY
+
+
+def test_choice_and_text_answers_are_kept():
+    assert parse_answer(RADIO, "any") == "any"
+    assert parse_answer(RADIO, " Yes") == " Yes"
+    assert parse_answer(FREE_TEXT, " Loop ") == "Loop"
+
+
+@pytest.mark.parametrize("kind, answer", [
+    (NUMERIC, "Missing"),
+    (NUMERIC, "<abc"),
+    (NUMERIC, "1..x"),
+    (DATE, "2025-13-01"),
+    (DATE, "18"),
+])
+def test_unparseable_answers_are_invalid(kind, answer):
+    assert parse_answer(kind, answer) is None
+
+
+def test_non_string_answers():
+    assert parse_answer(NUMERIC, 18) == 18.0
+    assert parse_answer(NUMERIC, 18.5) == 18.5
+    assert parse_answer(DATE, date(2025, 3, 4)) == date(2025, 3, 4)
+    assert parse_answer(RADIO, 1) == "1"
+
+
+def test_compile_answers_merges_equal_numbers():
+    exact, ranges, invalid = compile_answers(
+        NUMERIC, [("5", (1,)), ("5.0", (2,)), ("<0", (3,)), ("x", (4,))]
+    )
+    assert exact == {5.0: (1, 2)}
+    assert [targets for _, targets in ranges] == [(3,)]
+    assert invalid == ("x",)
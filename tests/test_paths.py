@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from conftest import ROOT, make_rules, yes_no
+from safeguarding.paths import path_stats
+from safeguarding.spec import compile_spec
+
+WORKBOOK = os.path.join(ROOT, "Data", "Safeguarding specification v0.1 2025_12_19_PK.xlsx")
+
+
+def test_counts_match_enumeration():
+    # A-Yes-B-Yes-D, A-Yes-B-No-END, A-No-C-Yes-D, A-No-C-No-E and F alone
+    rules = make_rules(
+        yes_no("A", "B", "C", "E", "F") + [("D", "free_text", "")],
+        [
+            ("A", "Yes", "B"), ("A", "No", "C"),
+            ("B", "Yes", "D"), ("B", "No", ""),
+            ("C", "Yes", "D"), ("C", "No", "E"),
+        ],
+    )
+    stats = path_stats(rules)
+    assert stats.paths == 5
+    assert not stats.loops
+    assert stats.by_root == {"A": 4, "F": 1}
+    assert stats.lengths == {1: 1, 2: 1, 3: 3}
+    assert (stats.shortest, stats.longest) == (1, 3)
+    assert stats.mean_length == pytest.approx(12 / 5)
+    assert stats.depths == {0: 2, 1: 2, 2: 2}
+    assert [row[:2] for row in stats.coverage] == [
+        ("A", 4), ("B", 2), ("C", 2), ("D", 2), ("E", 1), ("F", 1),
+    ]
+    assert stats.coverage[0][2] == pytest.approx(0.8)
+
+
+def test_loop_rule_ends_the_path():
+    # B-Yes leads back to A, which is already on the path
+    rules = make_rules(
+        yes_no("R", "A", "B"),
+        [("R", "Yes", "A"), ("A", "Yes", "B"), ("B", "Yes", "A"), ("B", "No", "")],
+    )
+    stats = path_stats(rules)
+    assert stats.paths == 2
+    assert stats.loops
+    assert stats.lengths == {3: 2}
+
+
+@pytest.mark.skipif(not os.path.exists(WORKBOOK), reason="specification workbook not present")
+def test_real_workbook_counts():
+    # Checked against brute-force enumeration of every path
+    rules = compile_spec(WORKBOOK).rules
+    assert {name: path_stats(rules[name]).paths for name in rules} == {
+        "safeguarding": 39535,
+        "police": 1329,
+        "fire": 104,
+    }
@@ -0,0 +1,36 @@
+import pytest
+
+from safeguarding.referrals import Referral, ReferralStore, ReferralWriteError
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReferralStore(str(tmp_path / "referrals.sqlite3"), retries=1, retry_delay=0)
+    yield store
+    store.close()
+
+
+def test_submit_resolves_once_committed(store):
+    referral = Referral("fire", "v1", [("FR01", "Yes")])
+    assert store.submit(referral).result(timeout=10) == referral.id
+    assert [r.path for r in store.recent()] == [[("FR01", "Yes")]]
+
+
+def test_bad_row_fails_alone(store):
+    good = [Referral("fire", "v1", [("FR01", str(i))]) for i in range(3)]
+    bad = Referral(None, "v1", [("FR01", "No")])
+
+    futures = [store.submit(r) for r in (good[0], bad, good[1], good[2])]
+
+    with pytest.raises(ReferralWriteError):
+        futures[1].result(timeout=10)
+    assert [f.result(timeout=10) for f in futures[:1] + futures[2:]] == [r.id for r in good]
+    assert store.count() == 3
+    assert store.errors
+
+
+def test_resubmitting_the_same_referral_stores_it_once(store):
+    referral = Referral("police", "v1", [("PO01", "Yes")])
+    store.submit(referral).result(timeout=10)
+    store.submit(referral).result(timeout=10)
+    assert store.count() == 1
@@ -0,0 +1,34 @@
+import os
+import time
+
+from conftest import write_sheets, yes_no
+from safeguarding.audit import run_audit
+from safeguarding.reload import SpecWatcher
+
+RULES = [("A", "Yes", "B"), ("B", "Yes", "C"), ("A", "No", "MISSING")]
+
+
+def test_watcher_does_not_decode_shared_rules(tmp_path):
+    workbook = write_sheets(tmp_path / "spec.xlsx", yes_no("A", "B", "C"), RULES)
+    watcher = SpecWatcher(workbook, snapshot_dir=str(tmp_path), start=False, shared=True)
+    dr = watcher.current.rules["test"]
+    assert dr.questions.items == [None] * 3
+    assert dr.edges.items == [None] * 4
+
+    # The stored report is the one the rules would give
+    assert watcher.report.to_dict() == run_audit(watcher.current.rules).to_dict()
+    assert watcher.report["test"].missing_targets == ("MISSING",)
+
+
+def test_pinned_version_keeps_its_sheets_after_reload(tmp_path):
+    workbook = write_sheets(tmp_path / "spec.xlsx", yes_no("A", "B", "C"), RULES)
+    watcher = SpecWatcher(workbook, snapshot_dir=str(tmp_path), start=False, shared=True)
+    pinned = watcher.current
+
+    time.sleep(0.01)
+    write_sheets(workbook, yes_no("A", "B"), RULES[:1])
+    assert watcher.check()
+    assert not any(pinned.version[:16] in name for name in os.listdir(tmp_path))
+
+    assert list(pinned.df_q["field_ref"]) == ["A", "B", "C"]
+    assert list(watcher.current.df_q["field_ref"]) == ["A", "B"]